@@ -1,5 +1,7 @@
+from typing import FrozenSet, Optional
+
 from dependency_injector.wiring import Provide, inject
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from jose import JWTError
 
 from app.core.di import Container
@@ -31,7 +33,29 @@ async def get_current_user(request: Request, auth_service: AuthService = Depends
     except JWTError:
         raise credentials_exception
 
-    user = await auth_service.get(user_id)
+    try:
+        user = await auth_service.get_principal(user_id)
+    except ValueError:
+        raise credentials_exception
+
     if not user:
         raise credentials_exception
     return user
+
+
+def get_if_match_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    tag = if_match.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="If-Match must be a task version ETag")
+    return int(tag)
+
+
+def get_if_none_match(if_none_match: Optional[str] = Header(None)) -> Optional[FrozenSet[str]]:
+    if if_none_match is None:
+        return None
+
+    # Weak comparison as RFC 9110 requires for If-None-Match
+    return frozenset(tag.strip().removeprefix("W/") for tag in if_none_match.split(",") if tag.strip())
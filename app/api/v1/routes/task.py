@@ -1,15 +1,15 @@
 import uuid
-from typing import Optional
+from typing import FrozenSet, Optional
 
 from dependency_injector.wiring import Provide, inject
 from fastapi import APIRouter, Depends
 from fastapi.params import Query
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_if_none_match
 from app.core.di import Container
-from app.models.user import User
 from app.schemas.pagination import PaginationParams, PaginationResponse
-from app.schemas.task import TaskResponse, TaskStatus
+from app.schemas.task import ResponseShape, TaskResponse, TaskStatus
+from app.schemas.user import UserPrincipal
 from app.services.task_service import TaskService
 
 task_router = APIRouter(tags=["task"])
@@ -18,16 +18,21 @@ task_router = APIRouter(tags=["task"])
 @task_router.get("/tasks", response_model=PaginationResponse[TaskResponse])
 @inject
 async def get_tasks(
-        _current_user: User = Depends(get_current_user),
+        _current_user: UserPrincipal = Depends(get_current_user),
         pagination: PaginationParams = Depends(),
         status: Optional[TaskStatus] = Query(None, description="Filter tasks by status"),
+        q: Optional[str] = Query(None, min_length=1, max_length=256,
+                                 description="Full-text search over title and description, results ranked"),
+        shape: ResponseShape = Query(ResponseShape.EMBEDDED,
+                                     description="normalized returns user_id per task and a users map"),
         task_service: TaskService = Depends(Provide[Container.task_service])):
-    return await task_service.get_all(status=status, pagination=pagination)
+    return await task_service.get_all(status=status, q=q, pagination=pagination, shape=shape)
 
 
 @task_router.get("/task", response_model=Optional[TaskResponse])
 @inject
-async def get_task(_current_user: User = Depends(get_current_user),
+async def get_task(_current_user: UserPrincipal = Depends(get_current_user),
                    task_id: uuid.UUID = Query(..., examples=["fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"]),
+                   if_none_match: Optional[FrozenSet[str]] = Depends(get_if_none_match),
                    task_service: TaskService = Depends(Provide[Container.task_service])):
-    return await task_service.get(task_id)
+    return await task_service.get(task_id, if_none_match)
@@ -1,15 +1,20 @@
 import uuid
-from typing import Dict, Optional
+from typing import Dict, FrozenSet, List, Optional
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Body, Depends, Query
+from fastapi import APIRouter, Body, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 
-from app.api.deps import get_current_user
+from app.api.deps import (get_current_user, get_if_match_version,
+                          get_if_none_match)
+from app.core.config import settings
 from app.core.di import Container
-from app.models.user import User
 from app.schemas.pagination import PaginationParams, PaginationResponse
-from app.schemas.task import (TaskCreate, TaskInDB, TaskResponse, TaskStatus,
-                              TaskUpdate, TaskUpdateInDB)
+from app.schemas.task import (ResponseShape, TaskBatchResult, TaskBatchUpdate,
+                              TaskCreate, TaskFileFormat, TaskImportReport,
+                              TaskInDB, TaskResponse, TaskStatus,
+                              TaskStatusSummary, TaskUpdate, TaskUpdateInDB)
+from app.schemas.user import UserPrincipal
 from app.services.task_service import TaskService
 
 user_router = APIRouter(tags=["user"], prefix="/user")
@@ -18,7 +23,7 @@ user_router = APIRouter(tags=["user"], prefix="/user")
 @user_router.post("/task")
 @inject
 async def create_task(task: TaskCreate,
-                      current_user: User = Depends(get_current_user),
+                      current_user: UserPrincipal = Depends(get_current_user),
                       task_service: TaskService = Depends(Provide[Container.task_service])):
     task_entity = TaskInDB(user_id=current_user.id, **task.model_dump())
     return await task_service.create(task_entity)
@@ -26,28 +31,98 @@ async def create_task(task: TaskCreate,
 
 @user_router.delete("/task", responses={204: {"detail": "deleted successfully"}})
 @inject
-async def delete_task(current_user: User = Depends(get_current_user),
+async def delete_task(current_user: UserPrincipal = Depends(get_current_user),
                       task_id: uuid.UUID = Query(..., examples=["fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"]),
+                      expected_version: Optional[int] = Depends(get_if_match_version),
                       task_service: TaskService = Depends(Provide[Container.task_service])):
-    return await task_service.delete_user_task(task_id, current_user.id)
+    return await task_service.delete_user_task(task_id, current_user.id, expected_version)
 
 
 @user_router.patch("/task")
 @inject
-async def update_task(current_user: User = Depends(get_current_user),
+async def update_task(current_user: UserPrincipal = Depends(get_current_user),
                       task: Optional[TaskUpdate] = Body(None),
                       status: Optional[TaskStatus] = Query(None),
                       task_id: uuid.UUID = Query(..., examples=["fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"]),
+                      expected_version: Optional[int] = Depends(get_if_match_version),
                       task_service: TaskService = Depends(Provide[Container.task_service])):
     task_data: TaskUpdate | Dict = task.model_dump() if task else {}
     return await task_service.update_user_task(task_id, current_user.id,
-                                               TaskUpdateInDB(status=status, **task_data))
+                                               TaskUpdateInDB(status=status, **task_data), expected_version)
 
 
 @user_router.get("/tasks", response_model=PaginationResponse[TaskResponse])
 @inject
-async def get_tasks(current_user: User = Depends(get_current_user),
+async def get_tasks(current_user: UserPrincipal = Depends(get_current_user),
                     pagination: PaginationParams = Depends(),
                     status: Optional[TaskStatus] = Query(None, description="Filter tasks by status"),
+                    q: Optional[str] = Query(None, min_length=1, max_length=256,
+                                             description="Full-text search over title and description, results ranked"),
+                    shape: ResponseShape = Query(ResponseShape.EMBEDDED,
+                                                 description="normalized returns user_id per task and a users map"),
+                    if_none_match: Optional[FrozenSet[str]] = Depends(get_if_none_match),
                     task_service: TaskService = Depends(Provide[Container.task_service])):
-    return await task_service.get_user_task(current_user.id, status=status, pagination=pagination)
+    return await task_service.get_user_task(current_user.id, status=status, q=q, pagination=pagination, shape=shape,
+                                            if_none_match=if_none_match)
+
+
+@user_router.get("/tasks/summary", response_model=TaskStatusSummary)
+@inject
+async def get_tasks_summary(current_user: UserPrincipal = Depends(get_current_user),
+                            task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.get_status_summary(current_user.id)
+
+
+@user_router.get("/tasks/export", response_class=StreamingResponse,
+                 responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}})
+@inject
+async def export_tasks(current_user: UserPrincipal = Depends(get_current_user),
+                       export_format: TaskFileFormat = Query(TaskFileFormat.NDJSON, alias="format"),
+                       status: Optional[TaskStatus] = Query(None, description="Filter tasks by status"),
+                       task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.export_user_tasks(current_user.id, export_format, status=status)
+
+
+@user_router.get("/tasks/stream", response_class=StreamingResponse,
+                 responses={200: {"content": {"text/event-stream": {}}}})
+@inject
+async def stream_task_events(current_user: UserPrincipal = Depends(get_current_user),
+                             last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+                             task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.stream_user_events(current_user.id, last_event_id)
+
+
+@user_router.post("/tasks/import", response_model=TaskImportReport,
+                  openapi_extra={"requestBody": {"required": True, "content": {"application/x-ndjson": {},
+                                                                               "text/csv": {}}}})
+@inject
+async def import_tasks(request: Request,
+                       current_user: UserPrincipal = Depends(get_current_user),
+                       import_format: TaskFileFormat = Query(TaskFileFormat.NDJSON, alias="format"),
+                       task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.import_user_tasks(current_user.id, import_format, request.stream())
+
+
+@user_router.post("/tasks/batch", response_model=List[TaskBatchResult], status_code=201)
+@inject
+async def create_tasks(tasks: List[TaskCreate] = Body(..., min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE),
+                       current_user: UserPrincipal = Depends(get_current_user),
+                       task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.create_many([TaskInDB(user_id=current_user.id, **task.model_dump()) for task in tasks])
+
+
+@user_router.patch("/tasks/batch", response_model=List[TaskBatchResult])
+@inject
+async def update_tasks(tasks: List[TaskBatchUpdate] = Body(..., min_length=1,
+                                                           max_length=settings.TASK_BATCH_MAX_SIZE),
+                       current_user: UserPrincipal = Depends(get_current_user),
+                       task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.update_user_tasks(current_user.id, list({task.id: task for task in tasks}.values()))
+
+
+@user_router.delete("/tasks/batch", response_model=List[TaskBatchResult])
+@inject
+async def delete_tasks(task_ids: List[uuid.UUID] = Body(..., min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE),
+                       current_user: UserPrincipal = Depends(get_current_user),
+                       task_service: TaskService = Depends(Provide[Container.task_service])):
+    return await task_service.delete_user_tasks(current_user.id, list(dict.fromkeys(task_ids)))
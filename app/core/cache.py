@@ -0,0 +1,115 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.metrics import RequestStats, request_stats
+from app.core.query_log import QueryLog, current_query_log, query_inspector
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._calls: Dict[Hashable, Tuple[asyncio.Task, RequestStats, Optional[QueryLog]]] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._calls.get(key)
+        if flight is None:
+            self.calls += 1
+            caller_log = current_query_log.get()
+            stats = RequestStats()
+            log = QueryLog(caller_log.label) if caller_log is not None else None
+
+            async def run():
+                # Statements land in the flight's own stats and log, which are credited to every caller below
+                request_stats.set(stats)
+                current_query_log.set(log)
+                return await call()
+
+            # An empty context keeps the shared call away from the first caller's session and unit of work,
+            # and shield() below means that caller disconnecting does not cancel it for everyone else
+            task = asyncio.create_task(run(), context=contextvars.Context())
+            task.add_done_callback(lambda done: self._done(key, done))
+            flight = self._calls[key] = (task, stats, log)
+        else:
+            self.shared += 1
+
+        task, stats, log = flight
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._attribute(stats, log)
+
+    @staticmethod
+    def _attribute(stats: RequestStats, log: Optional[QueryLog]) -> None:
+        caller_stats = request_stats.get()
+        if caller_stats is not None:
+            caller_stats.add(stats)
+        caller_log = current_query_log.get()
+        if caller_log is not None and log is not None:
+            query_inspector.merge(caller_log, log)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        flight = self._calls.get(key)
+        if flight is not None and flight[0] is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody waited for is not reported as unhandled
+            task.exception()
+
+    def forget(self) -> None:
+        # Calls already running finish for their callers; anyone arriving later starts a fresh one
+        self._calls.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
@@ -0,0 +1,111 @@
+import asyncio
+import contextvars
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+import asyncpg
+
+RESYNC = {"event": "resync"}
+
+
+class ChangeFeed:
+    # One LISTEN connection per process fans notifications out to in-process subscribers,
+    # routed by the payload's `user_id`
+    def __init__(self, dsn: str, channel: str, queue_size: int = 100, connect_timeout: float = 10,
+                 reconnect_seconds: float = 1, connect: Callable[..., Awaitable[Any]] = asyncpg.connect):
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.channel = channel
+        self.queue_size = queue_size
+        self.connect_timeout = connect_timeout
+        self.reconnect_seconds = reconnect_seconds
+        self.connect = connect
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listening = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def start(self) -> None:
+        # Waits until LISTEN is active, so a subscriber cannot miss changes committed after it subscribed
+        if self._task is None or self._task.done():
+            self._listening.clear()
+            self._task = asyncio.create_task(self._listen(), context=contextvars.Context())
+        await asyncio.wait_for(self._listening.wait(), self.connect_timeout)
+
+    @asynccontextmanager
+    async def subscribe(self, key: Any) -> AsyncIterator[asyncio.Queue]:
+        await self.start()
+        queue = asyncio.Queue(self.queue_size)
+        queues = self._subscribers.setdefault(str(key), set())
+        queues.add(queue)
+        try:
+            yield queue
+        finally:
+            queues.discard(queue)
+            if not queues and self._subscribers.get(str(key)) is queues:
+                del self._subscribers[str(key)]
+
+    async def _listen(self) -> None:
+        reconnecting = False
+        while True:
+            try:
+                connection = await self.connect(self.dsn, timeout=self.connect_timeout)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+                logging.warning(f"Change feed cannot connect, retrying: {e}")
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            try:
+                await connection.add_listener(self.channel, self._notify)
+                self._listening.set()
+                if reconnecting:
+                    # Anything committed while the connection was down was never delivered
+                    for queues in self._subscribers.values():
+                        for queue in queues:
+                            self._put(queue, RESYNC)
+                await lost.wait()
+            except (OSError, asyncpg.PostgresError) as e:
+                logging.warning(f"Change feed LISTEN failed: {e}")
+            finally:
+                self._listening.clear()
+                if not connection.is_closed():
+                    connection.terminate()
+
+            logging.warning("Change feed connection lost, reconnecting")
+            reconnecting = True
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def _notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logging.warning(f"Ignoring malformed {channel} notification")
+            return
+
+        for queue in self._subscribers.get(str(event.get("user_id")), ()):
+            self._put(queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: Dict) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A subscriber this far behind gets one resync instead of an unbounded backlog
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
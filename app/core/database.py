@@ -1,38 +1,333 @@
 import asyncio
+import itertools
+import json
 import logging
+import time
 import traceback
+import uuid
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from contextvars import ContextVar
+from typing import (Any, AsyncGenerator, Callable, Dict, List, Optional,
+                    Sequence)
 
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (AsyncSession, async_scoped_session,
                                     async_sessionmaker, create_async_engine)
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import instrument_engine
+from app.core.query_log import inspect_engine, query_inspector
 
 Base = declarative_base()
 
 
+class PoolStats:
+    def __init__(self) -> None:
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.waits += 1
+        self.wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    stats: PoolStats | None = None
+
+    def _do_get(self):
+        # Only a checkout that finds no idle connection and no room to open one waits; an immediate
+        # checkout or a fresh connect is not counted
+        if self.stats is None or not self._exhausted():
+            return super()._do_get()
+
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record_wait(time.perf_counter() - started)
+
+    def _exhausted(self) -> bool:
+        return self.checkedin() == 0 and -1 < self._max_overflow <= self.overflow()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class _JoinedTransaction:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class RequestSession(AsyncSession):
+    # Repositories wrap writes in `session.begin()`; inside a unit of work those blocks join the
+    # request's transaction, which commits once as the response starts
+    def begin(self):
+        return _JoinedTransaction()
+
+
+class UnitOfWork:
+    def __init__(self, database: "Database"):
+        self.database = database
+        self.session: Optional[AsyncSession] = None
+        self.replica_session: Optional[AsyncSession] = None
+        self.writes = False
+        self.failed = False
+        self.finished = False
+        self.on_commit: List[Callable[[], None]] = []
+
+    def primary(self) -> AsyncSession:
+        if self.session is None:
+            self.session = self.database._request_factory()
+        return self.session
+
+    async def reader(self) -> AsyncSession:
+        # Reads share the primary session once the request has one, so they see its uncommitted writes
+        if self.session is not None or not self.database._replica_factories:
+            return self.primary()
+        if self.replica_session is None:
+            self.replica_session = await self.database._open_read_session()
+        return self.replica_session
+
+    async def complete(self, status_code: int) -> bool:
+        # Returns False when a successful response's writes could not be committed
+        self.finished = True
+        if not self.writes:
+            return True
+
+        if status_code < 400 and not self.failed:
+            try:
+                await self.session.commit()
+            except Exception as e:
+                logging.error(f"Request transaction commit failed: {e}")
+            else:
+                for callback in self.on_commit:
+                    callback()
+                return True
+        await self.session.rollback()
+        return status_code >= 400
+
+    async def close(self) -> None:
+        for session in (self.session, self.replica_session):
+            if session is not None:
+                await session.close()
+
+
+current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar("current_unit_of_work", default=None)
+
+
+def in_unit_of_work() -> bool:
+    unit_of_work = current_unit_of_work.get()
+    return unit_of_work is not None and not unit_of_work.finished
+
+
+def in_write_transaction() -> bool:
+    unit_of_work = current_unit_of_work.get()
+    return unit_of_work is not None and unit_of_work.writes and not unit_of_work.finished
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    # Outside a unit of work the caller's session has already committed
+    unit_of_work = current_unit_of_work.get()
+    if unit_of_work is not None and not unit_of_work.finished:
+        unit_of_work.on_commit.append(callback)
+    else:
+        callback()
+
+
+def engine_options(pool_size: int = 5,
+                   max_overflow: int = 10,
+                   pool_timeout: float = 30,
+                   pool_recycle: int = -1,
+                   pool_pre_ping: bool = False,
+                   statement_cache_size: int = 100,
+                   transaction_pooler: bool = False,
+                   connect_timeout: float = 10) -> Dict[str, Any]:
+    connect_args: Dict[str, Any] = {
+        "timeout": connect_timeout,
+        "statement_cache_size": statement_cache_size,
+        "prepared_statement_cache_size": statement_cache_size,
+    }
+    if transaction_pooler:
+        # Transaction-mode poolers hand every transaction a different backend, so named
+        # prepared statements must be unique and never reused across transactions.
+        connect_args.update(statement_cache_size=0, prepared_statement_cache_size=0,
+                            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__")
+
+    return {
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pool_pre_ping,
+        "connect_args": connect_args,
+    }
+
+
 class Database:
-    def __init__(self, db_url: str) -> None:
-        self._engine = create_async_engine(db_url)
+    def __init__(self, db_url: str, replica_urls: Sequence[str] = (), replica_retry_seconds: float = 30,
+                 **pool_options) -> None:
+        self.pool_stats = PoolStats()
+        self._engine = create_async_engine(db_url, **engine_options(**pool_options))
+        self._engine.pool.stats = self.pool_stats
+        instrument_engine(self._engine, "primary")
+        inspect_engine(self._engine)
         self._session_factory = async_scoped_session(
             async_sessionmaker(bind=self._engine, expire_on_commit=False, class_=AsyncSession),
             scopefunc=asyncio.current_task)
 
+        self._primary_read_factory = async_sessionmaker(bind=self._engine, expire_on_commit=False,
+                                                        class_=AsyncSession)
+        self._request_factory = async_sessionmaker(bind=self._engine, expire_on_commit=False, class_=RequestSession)
+        self._replica_engines = [create_async_engine(url, **engine_options(**pool_options)) for url in replica_urls]
+        for engine in self._replica_engines:
+            instrument_engine(engine, "replica")
+            inspect_engine(engine)
+        self._replica_factories = [async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+                                   for engine in self._replica_engines]
+        self._replica_cycle = itertools.cycle(range(len(self._replica_factories)))
+        self._replica_down_until = [0.0] * len(self._replica_factories)
+        self.replica_retry_seconds = replica_retry_seconds
+
+    @property
+    def engine(self):
+        return self._engine
+
     async def init_db(self):
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
+    async def warm_up(self, connections: int) -> None:
+        async def connect():
+            async with self._engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        connections = min(connections, self._engine.pool.size())
+        await asyncio.gather(*(connect() for _ in range(connections)))
+
+    def pool_status(self) -> Dict[str, float]:
+        pool = self._engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "waits": self.pool_stats.waits,
+            "wait_seconds_total": self.pool_stats.wait_time,
+            "wait_seconds_max": self.pool_stats.max_wait_time,
+        }
+
+    def replica_pool_status(self) -> List[Dict[str, float]]:
+        return [{"size": engine.pool.size(),
+                 "checked_in": engine.pool.checkedin(),
+                 "checked_out": engine.pool.checkedout(),
+                 "overflow": max(engine.pool.overflow(), 0)} for engine in self._replica_engines]
+
+    async def _open_read_session(self) -> AsyncSession:
+        for _ in range(len(self._replica_factories)):
+            index = next(self._replica_cycle)
+            if self._replica_down_until[index] > time.monotonic():
+                continue
+
+            session = self._replica_factories[index]()
+            try:
+                await session.connection()
+                return session
+            except (OSError, DBAPIError) as e:
+                logging.warning(f"Read replica {index} unavailable, falling back: {e}")
+                self._replica_down_until[index] = time.monotonic() + self.replica_retry_seconds
+                await session.close()
+
+        return self._primary_read_factory()
+
     @asynccontextmanager
-    async def session(self) -> AsyncGenerator[AsyncSession, None]:
-        session: AsyncSession = self._session_factory()
+    async def unit_of_work(self) -> AsyncGenerator[UnitOfWork, None]:
+        unit_of_work = UnitOfWork(self)
+        token = current_unit_of_work.set(unit_of_work)
         try:
-            yield session
-            await session.commit()
-        except Exception as e:
-            logging.error(f"Session rollback due to exception: {e}")
-            logging.error(traceback.format_exc())
-            await session.rollback()
-            raise
+            yield unit_of_work
         finally:
-            await session.close()
-            await self._session_factory.remove()
+            current_unit_of_work.reset(token)
+            # Closing rolls back anything that was not committed by complete()
+            await unit_of_work.close()
+
+    @asynccontextmanager
+    async def read_session(self) -> AsyncGenerator[AsyncSession, None]:
+        with query_inspector.scope("read_session"):
+            unit_of_work = current_unit_of_work.get()
+            if unit_of_work is not None and not unit_of_work.finished:
+                yield await unit_of_work.reader()
+                return
+
+            session = await self._open_read_session()
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+        with query_inspector.scope("session"):
+            unit_of_work = current_unit_of_work.get()
+            if unit_of_work is not None and not unit_of_work.finished:
+                unit_of_work.writes = True
+                try:
+                    yield unit_of_work.primary()
+                except Exception:
+                    unit_of_work.failed = True
+                    raise
+                return
+
+            session: AsyncSession = self._session_factory()
+            try:
+                yield session
+                await session.commit()
+            except Exception as e:
+                logging.error(f"Session rollback due to exception: {e}")
+                logging.error(traceback.format_exc())
+                await session.rollback()
+                raise
+            finally:
+                await session.close()
+                await self._session_factory.remove()
+
+
+class UnitOfWorkMiddleware:
+    def __init__(self, app, get_database: Callable[[], Database], exclude_paths: Sequence[str] = ()):
+        self.app = app
+        self.get_database = get_database
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        async with self.get_database().unit_of_work() as unit_of_work:
+            commit_failed = False
+
+            async def send_after_commit(message):
+                nonlocal commit_failed
+                if message["type"] == "http.response.start":
+                    # Commit before the client sees a success it could not rely on
+                    commit_failed = not await unit_of_work.complete(message["status"])
+                    if commit_failed:
+                        body = json.dumps({"detail": "Internal server error"}).encode()
+                        await send({"type": "http.response.start", "status": 500,
+                                    "headers": [(b"content-type", b"application/json"),
+                                                (b"content-length", str(len(body)).encode())]})
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                elif commit_failed:
+                    return
+                await send(message)
+
+            await self.app(scope, receive, send_after_commit)
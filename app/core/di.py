@@ -1,8 +1,13 @@
 from dependency_injector import containers, providers
 
+from app.core.cache import SingleFlight, TTLCache
+from app.core.change_feed import ChangeFeed
 from app.core.config import settings
 from app.core.database import Database
+from app.core.rate_limit import create_rate_limit_backend, parse_limit
+from app.core.write_combiner import WriteCombiner
 from app.repository import TaskRepository, UserRepository
+from app.repository.task_repository import TASK_EVENTS_CHANNEL
 from app.services import AuthService, TaskService, UserService
 
 
@@ -16,11 +21,53 @@ class Container(containers.DeclarativeContainer):
         ]
     )
 
-    database = providers.Singleton(Database, db_url=settings.DATABASE_URL)
+    database = providers.Singleton(Database,
+                                   db_url=settings.DATABASE_URL,
+                                   replica_urls=settings.DATABASE_REPLICA_URLS,
+                                   replica_retry_seconds=settings.DB_REPLICA_RETRY_SECONDS,
+                                   pool_size=settings.DB_POOL_SIZE,
+                                   max_overflow=settings.DB_MAX_OVERFLOW,
+                                   pool_timeout=settings.DB_POOL_TIMEOUT,
+                                   connect_timeout=settings.DB_CONNECT_TIMEOUT,
+                                   pool_recycle=settings.DB_POOL_RECYCLE,
+                                   pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                   statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+                                   transaction_pooler=settings.DB_TRANSACTION_POOLER)
+    user_cache = providers.Singleton(TTLCache, maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+    single_flight = providers.Singleton(SingleFlight)
+    rate_limiter = providers.Singleton(create_rate_limit_backend,
+                                       redis_url=settings.RATE_LIMIT_REDIS_URL,
+                                       max_keys=settings.RATE_LIMIT_MAX_KEYS)
 
-    user_repository = providers.Factory(UserRepository, session_factory=database.provided.session)
-    task_repository = providers.Factory(TaskRepository, session_factory=database.provided.session)
+    user_repository = providers.Factory(UserRepository,
+                                        session_factory=database.provided.session,
+                                        read_session_factory=database.provided.read_session,
+                                        user_cache=user_cache,
+                                        single_flight=single_flight if settings.DB_READ_COALESCING else None)
+    task_repository = providers.Factory(TaskRepository,
+                                        session_factory=database.provided.session,
+                                        read_session_factory=database.provided.read_session,
+                                        single_flight=single_flight if settings.DB_READ_COALESCING else None,
+                                        notify=settings.TASK_EVENTS_ENABLED)
+    task_create_combiner = providers.Singleton(WriteCombiner,
+                                               flush=task_repository.provided.create_many,
+                                               max_batch=settings.TASK_CREATE_COMBINER_MAX_BATCH,
+                                               max_delay=settings.TASK_CREATE_COMBINER_MAX_DELAY_SECONDS)
+    task_change_feed = providers.Singleton(ChangeFeed,
+                                           dsn=settings.TASK_EVENTS_DATABASE_URL or settings.DATABASE_URL,
+                                           channel=TASK_EVENTS_CHANNEL,
+                                           queue_size=settings.TASK_EVENTS_QUEUE_SIZE,
+                                           connect_timeout=settings.DB_CONNECT_TIMEOUT)
 
     user_service = providers.Factory(UserService, user_repository=user_repository)
-    auth_service = providers.Factory(AuthService, user_repository=user_repository)
-    task_service = providers.Factory(TaskService, task_repository=task_repository)
+    auth_service = providers.Factory(AuthService, user_repository=user_repository, user_cache=user_cache,
+                                     rate_limiter=rate_limiter if settings.RATE_LIMIT_ENABLED else None,
+                                     username_limit=parse_limit(settings.RATE_LIMIT_LOGIN_USERNAME))
+    task_service = providers.Factory(TaskService, task_repository=task_repository,
+                                     export_batch_size=settings.TASK_EXPORT_BATCH_SIZE,
+                                     import_chunk_size=settings.TASK_IMPORT_CHUNK_SIZE,
+                                     import_max_errors=settings.TASK_IMPORT_MAX_ERRORS,
+                                     create_combiner=(task_create_combiner if settings.TASK_CREATE_COMBINER_ENABLED
+                                                      else None),
+                                     change_feed=task_change_feed if settings.TASK_EVENTS_ENABLED else None,
+                                     event_heartbeat_seconds=settings.TASK_EVENTS_HEARTBEAT_SECONDS)
@@ -10,3 +10,23 @@ class ObjectNotFoundException(RepositoryException):
         self.model_name = model_name
         self.obj_id = obj_id
         super().__init__(f"{model_name} with id {obj_id} not found")
+
+
+class VersionConflictException(RepositoryException):
+    def __init__(self, model_name: str, obj_id: UUID, expected_version: int):
+        self.model_name = model_name
+        self.obj_id = obj_id
+        self.expected_version = expected_version
+        super().__init__(f"{model_name} with id {obj_id} is no longer at version {expected_version}")
+
+
+class InvalidCursorException(RepositoryException):
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+        super().__init__(f"Invalid pagination cursor {cursor!r}")
+
+
+class PasswordHasherBusyException(Exception):
+    def __init__(self, pending: int):
+        self.pending = pending
+        super().__init__(f"Password hashing queue is full ({pending} pending)")
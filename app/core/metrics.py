@@ -0,0 +1,262 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Sequence,
+                    Tuple)
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+STATEMENT_KINDS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "EXPLAIN", "LOCK"})
+
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per series: one non-cumulative count per bucket plus +Inf, then the running sum
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for label_values, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{_format_labels(self.labels, label_values, INF_LABEL)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}"
+
+
+class Gauge:
+    # Read at scrape time from state the application already keeps; `type` may be "counter" for running totals
+    def __init__(self, name: str, help: str, labels: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]], type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.type = type
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Counter | Histogram | Gauge] = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str],
+              collect: Callable[[], Iterable[Tuple[Sequence[str], float]]], type: str = "gauge") -> Gauge:
+        return self._register(Gauge(name, help, labels, collect, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route template",
+                                          ("method", "route", "status"))
+http_request_db_statements = metrics.histogram("http_request_db_statements", "SQL statements executed per request",
+                                               ("method", "route"), COUNT_BUCKETS)
+http_request_db_duration = metrics.histogram("http_request_db_duration_seconds", "Time spent in SQL per request",
+                                             ("method", "route"))
+# The histogram's _count doubles as the statement counter
+db_statement_duration = metrics.histogram("db_statement_duration_seconds", "SQL statement latency", ("role", "kind"))
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    def add(self, other: "RequestStats") -> None:
+        self.statements += other.statements
+        self.db_seconds += other.db_seconds
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def statement_kind(statement: str) -> str:
+    words = statement.lstrip()[:8].split(None, 1)
+    kind = words[0].upper() if words else "OTHER"
+    return kind if kind in STATEMENT_KINDS else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine, role: str) -> None:
+    # Async engines emit their events from the underlying sync engine, in the caller's context
+    sync_engine = engine.sync_engine
+    statement_labels: Dict[str, Tuple[str, str]] = {}
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("statement_started", None)
+        if started is None:
+            return
+
+        elapsed = time.perf_counter() - started
+        labels = statement_labels.get(statement)
+        if labels is None:
+            labels = (role, statement_kind(statement))
+            # SQLAlchemy reuses compiled statement strings, so this stays small; the cap guards literal SQL
+            if len(statement_labels) < 1024:
+                statement_labels[statement] = labels
+        db_statement_duration.observe(elapsed, *labels)
+
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+
+def register_database_metrics(get_database: Callable[[], Any]) -> None:
+    def pools():
+        database = get_database()
+        yield "primary", 0, database.pool_status()
+        for index, status in enumerate(database.replica_pool_status()):
+            yield "replica", index, status
+
+    def connections():
+        for role, index, status in pools():
+            for state in ("checked_in", "checked_out", "overflow"):
+                yield (role, str(index), state), status[state]
+
+    def pool_size():
+        for role, index, status in pools():
+            yield (role, str(index)), status["size"]
+
+    def pool_waits():
+        status = get_database().pool_status()
+        yield (), status["waits"]
+
+    def pool_wait_seconds():
+        status = get_database().pool_status()
+        yield (), status["wait_seconds_total"]
+
+    metrics.gauge("db_pool_connections", "Pooled connections by state", ("role", "index", "state"), connections)
+    metrics.gauge("db_pool_size", "Configured pool size", ("role", "index"), pool_size)
+    metrics.gauge("db_pool_waits_total", "Checkouts that had to wait for a connection", (), pool_waits, "counter")
+    metrics.gauge("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection", (), pool_wait_seconds,
+                  "counter")
+
+
+def register_cache_metrics(caches: Dict[str, Any]) -> None:
+    def stat(key):
+        def collect():
+            for name, cache in caches.items():
+                yield (name,), cache.stats()[key]
+        return collect
+
+    metrics.gauge("cache_hits_total", "Cache hits", ("cache",), stat("hits"), "counter")
+    metrics.gauge("cache_misses_total", "Cache misses", ("cache",), stat("misses"), "counter")
+    metrics.gauge("cache_entries", "Entries currently cached", ("cache",), stat("size"))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_stats.reset(token)
+
+            # The router stores the matched route in the scope; raw paths would explode label cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(elapsed, method, route, str(status_code))
+            http_request_db_statements.observe(stats.statements, method, route)
+            http_request_db_duration.observe(stats.db_seconds, method, route)
@@ -0,0 +1,139 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+MAX_RECORDED_STATEMENTS = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):(?!:)\w+")
+_LIST = re.compile(r"\((?:\s*\?\s*(?:::\w+(?:\[\])?)?\s*,)*\s*\?\s*(?:::\w+(?:\[\])?)?\s*\)")
+_ROWS = re.compile(r"(\(\.\.\.\)\s*,\s*)+\(\.\.\.\)")
+_WHITESPACE = re.compile(r"\s+")
+
+slow_queries = metrics.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_SECONDS")
+n_plus_one = metrics.counter("db_n_plus_one_total", "Requests where one statement fingerprint repeated too often")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    # Literals and bind parameters become `?` and lists of them collapse, so "the same query"
+    # groups together regardless of the values or how many ids were passed
+    sql = _STRING.sub("?", statement)
+    sql = _PARAMETER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    sql = _ROWS.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryLog:
+    def __init__(self, label: str):
+        self.label = label
+        self.statements: List[Tuple[str, float]] = []
+        self.counts: Dict[str, int] = {}
+
+
+current_query_log: ContextVar[Optional[QueryLog]] = ContextVar("current_query_log", default=None)
+
+
+class QueryInspector:
+    def __init__(self, enabled: bool, slow_query_seconds: float, n_plus_one_threshold: int):
+        self.enabled = enabled
+        self.slow_query_seconds = slow_query_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    def configure(self, enabled: Optional[bool] = None, slow_query_seconds: Optional[float] = None,
+                  n_plus_one_threshold: Optional[int] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_query_seconds is not None:
+            self.slow_query_seconds = slow_query_seconds
+        if n_plus_one_threshold is not None:
+            self.n_plus_one_threshold = n_plus_one_threshold
+
+    def toggle(self) -> None:
+        self.enabled = not self.enabled
+        logging.warning(f"Query inspector {'enabled' if self.enabled else 'disabled'}")
+
+    @contextmanager
+    def scope(self, label: str) -> Iterator[Optional[QueryLog]]:
+        # Nested scopes (a session opened inside a request) share the outermost log
+        log = current_query_log.get()
+        if log is not None or not self.enabled:
+            yield log
+            return
+
+        log = QueryLog(label)
+        token = current_query_log.set(log)
+        try:
+            yield log
+        finally:
+            current_query_log.reset(token)
+
+    def record(self, log: QueryLog, statement: str, duration: float) -> None:
+        sql = fingerprint(statement)
+        if len(log.statements) < MAX_RECORDED_STATEMENTS:
+            log.statements.append((sql, duration))
+
+        if duration >= self.slow_query_seconds:
+            slow_queries.inc()
+            logging.warning(f"Slow query ({duration * 1000:.1f} ms) in {log.label}: {sql}")
+
+        self._count(log, sql, 1)
+
+    def merge(self, log: QueryLog, shared: QueryLog) -> None:
+        # A read shared between requests counts towards each of them; its slow statements were logged once already
+        log.statements.extend(shared.statements[:MAX_RECORDED_STATEMENTS - len(log.statements)])
+        for sql, times in shared.counts.items():
+            self._count(log, sql, times)
+
+    def _count(self, log: QueryLog, sql: str, times: int) -> None:
+        before = log.counts.get(sql, 0)
+        log.counts[sql] = before + times
+        if before <= self.n_plus_one_threshold < before + times:
+            n_plus_one.inc()
+            logging.warning(f"Possible N+1 in {log.label}: statement ran more than "
+                            f"{self.n_plus_one_threshold} times: {sql}")
+
+
+query_inspector = QueryInspector(settings.QUERY_INSPECTOR_ENABLED, settings.SLOW_QUERY_SECONDS,
+                                 settings.N_PLUS_ONE_THRESHOLD)
+
+
+def inspect_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_query_log.get() is not None:
+            conn.info["query_log_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_log_started", None)
+        log = current_query_log.get()
+        if started is not None and log is not None:
+            query_inspector.record(log, statement, time.perf_counter() - started)
+
+
+class QueryLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        with query_inspector.scope(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
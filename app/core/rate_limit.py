@@ -0,0 +1,176 @@
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Protocol
+
+from jose import JWTError
+
+from app.core.security import decode_token
+
+
+class Limit(NamedTuple):
+    capacity: float
+    rate: float
+
+
+def parse_limit(value: str) -> Limit:
+    # "<requests>/<seconds>": a bucket of <requests> tokens refilled evenly over <seconds>
+    requests, _, seconds = value.partition("/")
+    capacity, period = float(requests), float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}")
+    return Limit(capacity, capacity / period)
+
+
+class RateLimitBackend(Protocol):
+    # Takes `cost` tokens; returns 0 when allowed, otherwise the seconds until enough have refilled
+    async def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        ...
+
+
+class MemoryRateLimitBackend:
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        now = self.clock()
+        tokens, updated = self._buckets.pop(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / limit.rate
+
+        # Evicting the least recently used bucket only ever resets someone to a full budget
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Refill and take in one round trip; Redis server time keeps every worker on the same clock
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend:
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the `redis` package is not installed")
+
+        self.prefix = prefix
+        self._redis = Redis.from_url(url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        try:
+            return float(await self._script(keys=[self.prefix + key], args=[limit.capacity, limit.rate, cost]))
+        except Exception as e:
+            # An unreachable limiter must not take the API down with it
+            logging.warning(f"Rate limit backend unavailable, allowing request: {e}")
+            return 0.0
+
+
+def create_rate_limit_backend(redis_url: Optional[str] = None, max_keys: int = 100_000) -> RateLimitBackend:
+    if redis_url:
+        return RedisRateLimitBackend(redis_url)
+    return MemoryRateLimitBackend(max_keys)
+
+
+class RateLimitRule(NamedTuple):
+    name: str
+    limit: Limit
+    method: Optional[str] = None
+    path: Optional[str] = None
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, backend: RateLimitBackend, rules: List[RateLimitRule], default: Limit,
+                 trust_forwarded_for: bool = False, trusted_proxies: int = 1):
+        self.app = app
+        self.backend = backend
+        self.rules = {(rule.method, rule.path): rule for rule in rules}
+        self.default = RateLimitRule("default", default)
+        self.trust_forwarded_for = trust_forwarded_for
+        self.trusted_proxies = max(trusted_proxies, 1)
+
+    def _client_ip(self, scope) -> str:
+        if self.trust_forwarded_for:
+            # Proxies append to whatever the client sent, so only the entries our own proxies added can be
+            # trusted: the one `trusted_proxies` hops from the right is the address the outermost proxy saw
+            entries = [entry.strip() for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+                       for entry in value.decode("latin-1").split(",") if entry.strip()]
+            if entries:
+                return entries[max(len(entries) - self.trusted_proxies, 0)]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _user_id(scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name != b"cookie":
+                continue
+            for cookie in value.decode("latin-1").split(";"):
+                cookie_name, _, token = cookie.strip().partition("=")
+                if cookie_name == "access_token" and token:
+                    try:
+                        return (decode_token(token) or {}).get("sub")
+                    except JWTError:
+                        return None
+        return None
+
+    def _key(self, scope, rule: RateLimitRule) -> str:
+        # Route budgets are per IP: they guard unauthenticated endpoints such as login.
+        # The default budget follows the user across IPs once a valid token is presented.
+        if rule is self.default:
+            user_id = self._user_id(scope)
+            if user_id:
+                return f"{rule.name}:user:{user_id}"
+        return f"{rule.name}:ip:{self._client_ip(scope)}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rule = self.rules.get((scope["method"], scope["path"]), self.default)
+        retry_after = await self.backend.acquire(self._key(scope, rule), rule.limit)
+        if retry_after <= 0:
+            return await self.app(scope, receive, send)
+
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
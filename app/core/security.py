@@ -1,4 +1,8 @@
+import asyncio
+import hashlib
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Tuple
 from uuid import UUID
@@ -6,10 +10,15 @@ from uuid import UUID
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.exceptions import PasswordHasherBusyException
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE,
+                       ttl=max(settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+
 
 def verify_password(plain_password, hashed_password) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,6 +28,50 @@ def hash_password(password) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasher:
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusyException(self.pending)
+
+        if self._executor is None:
+            # bcrypt releases the GIL while hashing, so a thread pool gives real parallelism here
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password, hashed_password) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+
+async def hash_password_async(password) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
 def create_token(data: Dict, expires_delta: timedelta) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta
@@ -45,8 +98,18 @@ def create_tokens(id: UUID) -> Tuple[str, str]:
 
 
 def decode_token(token: str) -> Dict | None:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+
+    # A verified token stays valid until its exp claim, so it only needs to be checked once
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        token_cache.set(key, payload, ttl=expires_at - time.time())
+    return payload
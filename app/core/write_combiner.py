@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+class WriteCombiner[T, R]:
+    # Collects concurrent submissions for up to max_delay seconds (or max_batch items) and writes them with
+    # one flush call, which must return one result per item in order
+    def __init__(self, flush: Callable[[List[T]], Awaitable[List[R]]], max_batch: int = 500,
+                 max_delay: float = 0.005):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.items = 0
+        self.fallbacks = 0
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Callers that gave up before the flush started are dropped rather than written
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+
+        # An empty context keeps the flush out of any one request's unit of work
+        task = asyncio.create_task(self._flush(batch), context=contextvars.Context())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.flush([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._settle(batch[0][1], error=e)
+                return
+
+            # One bad item fails the whole statement; retry one by one so only that caller sees the error
+            self.fallbacks += 1
+            for item, future in batch:
+                try:
+                    result, = await self.flush([item])
+                except Exception as e:
+                    self._settle(future, error=e)
+                else:
+                    self._settle(future, result)
+            return
+
+        for (_, future), result in zip(batch, results):
+            self._settle(future, result)
+
+    @staticmethod
+    def _settle(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def close(self) -> None:
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "items": self.items, "fallbacks": self.fallbacks,
+                "pending": len(self._pending)}
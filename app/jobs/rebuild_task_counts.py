@@ -0,0 +1,26 @@
+import argparse
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import Database
+from app.repository import TaskRepository
+
+
+async def main(user_id: Optional[uuid.UUID]) -> None:
+    db = Database(settings.DATABASE_URL)
+    try:
+        rebuilt = await TaskRepository(session_factory=db.session).rebuild_status_counts(user_id)
+        print(f"Rebuilt {rebuilt} task status counter(s)")
+    finally:
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.rebuild_task_counts",
+                                     description="Recompute task_status_count from the task table")
+    parser.add_argument("--user-id", type=uuid.UUID, default=None, help="only rebuild this user's counters")
+    asyncio.run(main(parser.parse_args().user_id))
@@ -1,19 +1,47 @@
+import asyncio
+import logging
+import signal
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
 from app.api.main import api_router
+from app.api.metrics import metrics_router
 from app.core.config import settings
+from app.core.database import UnitOfWorkMiddleware
 from app.core.di import Container
+from app.core.metrics import (MetricsMiddleware, metrics,
+                              register_cache_metrics,
+                              register_database_metrics)
+from app.core.query_log import QueryLogMiddleware, query_inspector
+from app.core.rate_limit import RateLimitMiddleware, RateLimitRule, parse_limit
+from app.core.security import password_hasher, token_cache
+from app.migrations import pending
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     db = app.container.database()
-    await db.init_db()
+    outstanding = await pending(db.engine)
+    if outstanding:
+        logging.warning("Database schema is behind, run `python -m app.migrations upgrade`. Pending: "
+                        + ", ".join(f"{migration.version:04d}_{migration.name}" for migration in outstanding))
+    await db.warm_up(settings.DB_POOL_PREWARM)
+
+    loop = asyncio.get_running_loop()
+    if hasattr(signal, "SIGUSR2"):
+        loop.add_signal_handler(signal.SIGUSR2, query_inspector.toggle)
 
     yield
 
+    if settings.TASK_CREATE_COMBINER_ENABLED:
+        await app.container.task_create_combiner().close()
+    if settings.TASK_EVENTS_ENABLED:
+        await app.container.task_change_feed().close()
+    if hasattr(signal, "SIGUSR2"):
+        loop.remove_signal_handler(signal.SIGUSR2)
+    password_hasher.shutdown()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -22,3 +50,56 @@ app = FastAPI(
 )
 app.container = Container()
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
+    register_database_metrics(app.container.database)
+    register_cache_metrics({"token": token_cache, "user": app.container.user_cache()})
+
+    def read_calls():
+        stats = app.container.single_flight().stats()
+        return [(("executed",), stats["calls"]), (("shared",), stats["shared"])]
+
+    metrics.gauge("db_read_calls_total", "Repository reads that ran a query or joined one already in flight",
+                  ("outcome",), read_calls, "counter")
+    if settings.TASK_CREATE_COMBINER_ENABLED:
+        def combined_creates():
+            stats = app.container.task_create_combiner().stats()
+            return [(("batches",), stats["batches"]), (("items",), stats["items"]),
+                    (("fallbacks",), stats["fallbacks"])]
+
+        metrics.gauge("task_create_combiner_total", "Combined task creates: flushes, tasks written and batches "
+                      "retried row by row", ("kind",), combined_creates, "counter")
+    if settings.TASK_EVENTS_ENABLED:
+        metrics.gauge("task_event_subscribers", "Open task event streams in this process", (),
+                      lambda: [((), app.container.task_change_feed().subscribers)])
+    metrics.gauge("password_hash_pending", "Password hash and verify calls queued or running", (),
+                  lambda: [((), password_hasher.pending)])
+
+if settings.DB_REQUEST_SESSION:
+    # Import commits chunk by chunk from a background COPY task, so it keeps its own sessions;
+    # the event stream would otherwise hold a pooled connection for as long as the client listens
+    app.add_middleware(UnitOfWorkMiddleware, get_database=app.container.database,
+                       exclude_paths=[f"{settings.API_V1_STR}/user/tasks/import",
+                                      f"{settings.API_V1_STR}/user/tasks/stream"])
+
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=app.container.rate_limiter(),
+        rules=[
+            RateLimitRule("login", parse_limit(settings.RATE_LIMIT_LOGIN), "POST", f"{settings.API_V1_STR}/auth/login"),
+            RateLimitRule("register", parse_limit(settings.RATE_LIMIT_REGISTER), "POST",
+                          f"{settings.API_V1_STR}/auth/register"),
+        ],
+        default=parse_limit(settings.RATE_LIMIT_DEFAULT),
+        trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+        trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
+    )
+
+# Opens the per-request query log even while disabled, so a toggle applies to the next request
+app.add_middleware(QueryLogMiddleware)
+
+if settings.METRICS_ENABLED:
+    # Added last so it wraps everything, including requests the rate limiter rejects
+    app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,104 @@
+import importlib
+import logging
+import pkgutil
+import re
+from types import ModuleType
+from typing import List, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+MIGRATION_LOCK_ID = 72_410_001
+VERSIONS_PACKAGE = "app.migrations.versions"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "transactional", True)
+
+
+def discover() -> List[Migration]:
+    package = importlib.import_module(VERSIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        match = re.fullmatch(r"(\d{4})_(\w+)", info.name)
+        if match is None:
+            continue
+        module = importlib.import_module(f"{VERSIONS_PACKAGE}.{info.name}")
+        migrations.append(Migration(int(match.group(1)), match.group(2), module))
+
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {VERSIONS_PACKAGE}: {versions}")
+    return migrations
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, definition: str) -> None:
+    # A failed concurrent build leaves an INVALID index behind that IF NOT EXISTS would silently keep
+    result = await conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name})
+    valid = result.scalar_one_or_none()
+    if valid is False:
+        await conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    await conn.exec_driver_sql(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+async def applied_versions(conn: AsyncConnection) -> set[int]:
+    exists = await conn.execute(text("SELECT to_regclass('schema_migrations')"))
+    if exists.scalar() is None:
+        return set()
+
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(result.scalars().all())
+
+
+async def pending(engine: AsyncEngine) -> List[Migration]:
+    async with engine.connect() as conn:
+        applied = await applied_versions(conn)
+    return [migration for migration in discover() if migration.version not in applied]
+
+
+async def upgrade(engine: AsyncEngine) -> List[Migration]:
+    migrations = discover()
+    upgraded = []
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            await conn.exec_driver_sql(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version integer PRIMARY KEY, "
+                "name varchar NOT NULL, "
+                "applied_at timestamptz NOT NULL DEFAULT now())"
+            )
+            applied = await applied_versions(conn)
+
+            for migration in migrations:
+                if migration.version in applied:
+                    continue
+
+                logging.info(f"Applying migration {migration.version:04d}_{migration.name}")
+                if migration.transactional:
+                    async with engine.begin() as tx_conn:
+                        await migration.module.upgrade(tx_conn)
+                        await _record(tx_conn, migration)
+                else:
+                    await migration.module.upgrade(conn)
+                    await _record(conn, migration)
+                upgraded.append(migration)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    return upgraded
+
+
+async def _record(conn: AsyncConnection, migration: Migration) -> None:
+    await conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                       {"version": migration.version, "name": migration.name})
@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.migrations import pending, upgrade
+
+
+async def main(command: str) -> None:
+    engine = create_async_engine(settings.DATABASE_URL)
+    try:
+        if command == "upgrade":
+            applied = await upgrade(engine)
+            print(f"Applied {len(applied)} migration(s)")
+            for migration in applied:
+                print(f"  {migration.version:04d}_{migration.name}")
+        else:
+            for migration in await pending(engine):
+                print(f"pending {migration.version:04d}_{migration.name}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    parser.add_argument("command", choices=["upgrade", "pending"], nargs="?", default="upgrade")
+    asyncio.run(main(parser.parse_args().command))
@@ -0,0 +1,48 @@
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Written to be a no-op on databases that were bootstrapped with Base.metadata.create_all. Every statement is
+# idempotent, so it runs outside a transaction and each step commits (and releases its locks) on its own
+transactional = False
+
+STATEMENTS = [
+    """
+    DO $$ BEGIN
+        CREATE TYPE taskstatus AS ENUM ('NEW', 'IN_PROGRESS', 'COMPLETED');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "user" (
+        id uuid PRIMARY KEY,
+        first_name varchar NOT NULL,
+        last_name text,
+        username varchar UNIQUE,
+        password varchar NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS task (
+        id uuid PRIMARY KEY,
+        title varchar NOT NULL,
+        description text,
+        status taskstatus,
+        user_id uuid NOT NULL
+    )
+    """,
+    "ALTER TABLE task ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1",
+    # One statement, so the constraint is never missing; NOT VALID skips the scan that would block writes
+    """
+    DO $$ BEGIN
+        ALTER TABLE task DROP CONSTRAINT IF EXISTS task_user_id_fkey;
+        ALTER TABLE task ADD CONSTRAINT task_user_id_fkey FOREIGN KEY (user_id) REFERENCES "user" (id)
+            ON DELETE CASCADE NOT VALID;
+    END $$
+    """,
+    # Its own transaction: validating only takes a lock that lets reads and writes continue during the scan
+    "ALTER TABLE task VALIDATE CONSTRAINT task_user_id_fkey",
+]
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for statement in STATEMENTS:
+        await conn.exec_driver_sql(statement)
@@ -0,0 +1,17 @@
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.migrations import create_index_concurrently
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+transactional = False
+
+INDEXES = {
+    "ix_task_user_id_id": "task (user_id, id)",
+    "ix_task_user_id_status_id": "task (user_id, status, id)",
+    "ix_task_status_id": "task (status, id)",
+}
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for name, definition in INDEXES.items():
+        await create_index_concurrently(conn, name, definition)
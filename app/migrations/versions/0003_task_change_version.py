@@ -0,0 +1,15 @@
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS task_change_version (
+        user_id uuid PRIMARY KEY REFERENCES "user" (id) ON DELETE CASCADE,
+        version bigint NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for statement in STATEMENTS:
+        await conn.exec_driver_sql(statement)
@@ -0,0 +1,26 @@
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.migrations import create_index_concurrently
+
+# The column is added in its own autocommit statement so the GIN index can then be built concurrently
+transactional = False
+
+STATEMENTS = [
+    """
+    ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+]
+
+INDEXES = {
+    "ix_task_search_vector": "task USING gin (search_vector)",
+}
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for statement in STATEMENTS:
+        await conn.exec_driver_sql(statement)
+    for name, definition in INDEXES.items():
+        await create_index_concurrently(conn, name, definition)
@@ -0,0 +1,71 @@
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Statement-level triggers with transition tables: a COPY or batch UPDATE of N rows costs one
+# grouped upsert per (user, status) instead of N row-level counter updates
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS task_status_count (
+        user_id uuid NOT NULL REFERENCES "user" (id) ON DELETE CASCADE,
+        status taskstatus NOT NULL,
+        count bigint NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, status)
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION task_status_count_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO task_status_count (user_id, status, count)
+            SELECT user_id, status, count(*) FROM new_rows
+            GROUP BY user_id, status ORDER BY user_id, status
+            ON CONFLICT (user_id, status) DO UPDATE SET count = task_status_count.count + EXCLUDED.count;
+        ELSIF TG_OP = 'DELETE' THEN
+            -- Never inserts here: during a cascading user delete the owner row is already gone
+            UPDATE task_status_count c SET count = c.count - d.removed
+            FROM (SELECT user_id, status, count(*) AS removed FROM old_rows GROUP BY user_id, status) d
+            WHERE c.user_id = d.user_id AND c.status = d.status;
+        ELSE
+            INSERT INTO task_status_count (user_id, status, count)
+            SELECT user_id, status, sum(delta) FROM (
+                SELECT user_id, status, 1 AS delta FROM new_rows
+                UNION ALL
+                SELECT user_id, status, -1 AS delta FROM old_rows
+            ) changes
+            GROUP BY user_id, status HAVING sum(delta) <> 0 ORDER BY user_id, status
+            ON CONFLICT (user_id, status) DO UPDATE SET count = task_status_count.count + EXCLUDED.count;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS task_status_count_insert ON task",
+    "DROP TRIGGER IF EXISTS task_status_count_update ON task",
+    "DROP TRIGGER IF EXISTS task_status_count_delete ON task",
+    """
+    CREATE TRIGGER task_status_count_insert AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_count_sync()
+    """,
+    """
+    CREATE TRIGGER task_status_count_update AFTER UPDATE ON task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_count_sync()
+    """,
+    """
+    CREATE TRIGGER task_status_count_delete AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_count_sync()
+    """,
+    # Writers are blocked for the backfill so no task is counted both by it and by a trigger
+    "LOCK TABLE task IN SHARE MODE",
+    "DELETE FROM task_status_count",
+    """
+    INSERT INTO task_status_count (user_id, status, count)
+    SELECT user_id, status, count(*) FROM task GROUP BY user_id, status
+    """,
+]
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for statement in STATEMENTS:
+        await conn.exec_driver_sql(statement)
@@ -1,21 +1,54 @@
 import uuid
 from typing import Annotated, Optional
 
-from sqlalchemy import UUID, Enum, ForeignKey, String, Text
+from sqlalchemy import (UUID, BigInteger, Computed, Enum, ForeignKey, Index,
+                        Integer, String, Text)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, Relationship, mapped_column
 
 from app.models.base import Base
 from app.models.enum import TaskStatus
 
+TASK_SEARCH_CONFIG = 'english'
+
 
 class Task(Base):
     __tablename__ = 'task'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_task_user_id_id', 'user_id', 'id'),
+        Index('ix_task_user_id_status_id', 'user_id', 'status', 'id'),
+        Index('ix_task_status_id', 'status', 'id'),
+        Index('ix_task_search_vector', 'search_vector', postgresql_using='gin'),
+        {'extend_existing': True},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     status: Mapped[Annotated[TaskStatus, "Current status of task"]] = mapped_column(Enum(TaskStatus),
                                                                                     default=TaskStatus.NEW)
-    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('user.id'))
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('user.id', ondelete='CASCADE'))
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"setweight(to_tsvector('{TASK_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+                 f"setweight(to_tsvector('{TASK_SEARCH_CONFIG}', coalesce(description, '')), 'B')", persisted=True),
+        deferred=True)
     user: Mapped["User"] = Relationship(back_populates="tasks")  # noqa
+
+
+class TaskChangeVersion(Base):
+    __tablename__ = 'task_change_version'
+    __table_args__ = {'extend_existing': True}
+
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class TaskStatusCount(Base):
+    __tablename__ = 'task_status_count'
+    __table_args__ = {'extend_existing': True}
+
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    status: Mapped[TaskStatus] = mapped_column(Enum(TaskStatus), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
@@ -16,4 +16,5 @@ class User(Base):
     last_name: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     username: Mapped[Optional[str]] = mapped_column(String, nullable=True, unique=True)
     password: Mapped[str] = mapped_column(String, nullable=False)
-    tasks: Mapped["Task"] = relationship(back_populates="user", cascade="all, delete-orphan")  # noqa
+    tasks: Mapped["Task"] = relationship(back_populates="user", cascade="all, delete-orphan",
+                                          passive_deletes=True)  # noqa
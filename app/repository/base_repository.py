@@ -1,29 +1,61 @@
-from contextlib import AbstractAsyncContextManager
-from typing import Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, Awaitable, Callable, Hashable, Tuple
 from uuid import UUID
 
 from pydantic import BaseModel
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core.cache import SingleFlight
+from app.core.database import after_commit, in_unit_of_work
 from app.core.exceptions import ObjectNotFoundException
 from app.models.base import Base
 
 
 class BaseRepository[Model: Base, CreateSchema: BaseModel, UpdateSchema: BaseModel]:
     def __init__(self,
-                 session_factory: Callable[[], AbstractAsyncContextManager[AsyncSession]], model_class: type[Model]):
-        self.session_factory = session_factory
+                 session_factory: Callable[[], AbstractAsyncContextManager[AsyncSession]], model_class: type[Model],
+                 read_session_factory: Callable[[], AbstractAsyncContextManager[AsyncSession]] | None = None,
+                 single_flight: SingleFlight | None = None):
+        self.read_session_factory = read_session_factory or session_factory
+        # For reads that must see everything committed so far; unlike session_factory it does not forget flights
+        self.primary_session_factory = session_factory
+        self.session_factory = session_factory if single_flight is None else self._forgetting(session_factory)
         self.model_class = model_class
+        self.single_flight = single_flight
+
+    def _forgetting(self, session_factory):
+        @asynccontextmanager
+        async def write_session():
+            async with session_factory() as session:
+                yield session
+            # Reads issued after this commit must not join a query that started before it
+            after_commit(self.single_flight.forget)
+
+        return write_session
+
+    async def _coalesce(self, key: Tuple[Hashable, ...], call: Callable[[], Awaitable[Any]]):
+        # Inside a unit of work reads go through the request's own session (and may see its uncommitted
+        # writes), so they are never handed to a shared call
+        if self.single_flight is None or in_unit_of_work():
+            return await call()
+        return await self.single_flight.do((self.model_class.__name__, *key), call)
 
     async def get_all(self):
-        async with self.session_factory() as session:
+        return await self._coalesce(("get_all",), self._get_all)
+
+    async def _get_all(self):
+        async with self.read_session_factory() as session:
             stmt = select(self.model_class)
             records = await session.execute(stmt)
             return records.scalars().all()
 
     async def get(self, id: UUID):
-        async with self.session_factory() as session:
+        return await self._coalesce(("get", id), lambda: self._get(id))
+
+    async def _get(self, id: UUID):
+        async with self.read_session_factory() as session:
             stmt = select(self.model_class).where(self.model_class.id == id)
             record = await session.execute(stmt)
             record = record.scalars().first()
@@ -41,30 +73,28 @@ class BaseRepository[Model: Base, CreateSchema: BaseModel, UpdateSchema: BaseMod
                 return db_obj
 
     async def update(self, id: UUID, data: UpdateSchema):
+        update_data = data.model_dump(exclude_unset=True, exclude_none=True)
+        if update_data:
+            stmt = update(self.model_class).where(self.model_class.id == id).values(**update_data).returning(
+                self.model_class)
+        else:
+            stmt = select(self.model_class).where(self.model_class.id == id)
+
         async with self.session_factory() as session:
             async with session.begin():
-                stmt = select(self.model_class).where(self.model_class.id == id).with_for_update()
                 record = await session.execute(stmt)
                 obj = record.scalars().one_or_none()
 
                 if obj is None:
                     raise ObjectNotFoundException(self.model_class.__name__, id)
 
-                update_data = data.model_dump(exclude_unset=True, exclude_none=True)
-                for field, val in update_data.items():
-                    setattr(obj, field, val)
-
-                await session.flush()
                 return obj
 
     async def delete(self, id: UUID):
         async with self.session_factory() as session:
             async with session.begin():
-                stmt = select(self.model_class).where(self.model_class.id == id).with_for_update()
-                record = await session.execute(stmt)
-                record = record.scalars().one_or_none()
+                stmt = delete(self.model_class).where(self.model_class.id == id).returning(self.model_class.id)
+                record = await session.execute(stmt.execution_options(synchronize_session=False))
 
-                if record is None:
+                if record.scalar_one_or_none() is None:
                     raise ObjectNotFoundException(self.model_class.__name__, id)
-
-                await session.delete(record)
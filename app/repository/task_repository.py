@@ -1,97 +1,425 @@
-from uuid import UUID
+import json
+from typing import AsyncIterator, Dict, List, Tuple
+from uuid import UUID, uuid4
 
-from sqlalchemy import func
+from sqlalchemy import (Text, and_, any_, bindparam, cast, column, delete,
+                        func, insert, literal, or_, text, update, values)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.expression import ClauseElement, Executable
 
-from app.core.exceptions import ObjectNotFoundException
-from app.models.task import Task
+from app.core.cache import SingleFlight
+from app.core.exceptions import (InvalidCursorException,
+                                 ObjectNotFoundException,
+                                 VersionConflictException)
+from app.models.task import (TASK_SEARCH_CONFIG, Task, TaskChangeVersion,
+                             TaskStatusCount)
+from app.models.user import User
 from app.repository.base_repository import BaseRepository
-from app.schemas.task import TaskInDB, TaskUpdateInDB
+from app.schemas.pagination import CountMode, decode_cursor, encode_cursor
+from app.schemas.task import (ResponseShape, TaskBatchUpdate, TaskCreate,
+                              TaskEventType, TaskInDB, TaskPage, TaskRecord,
+                              TaskRowRecord, TaskStatus, TaskUpdateInDB,
+                              UserRecord)
+
+COPY_COLUMNS = ("id", "title", "description", "status", "user_id", "version")
+
+TASK_EVENTS_CHANNEL = "task_events"
+MAX_EVENT_IDS = 100
+
+
+class Explain(Executable, ClauseElement):
+    # EXPLAIN keeps the statement's bound parameters; rendering them as literals fails for types such as REGCONFIG
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
 
 
 class TaskRepository(BaseRepository[Task, TaskInDB, TaskUpdateInDB]):
-    def __init__(self, session_factory):
-        super().__init__(session_factory, Task)
+    def __init__(self, session_factory, read_session_factory=None, single_flight: SingleFlight | None = None,
+                 notify: bool = False):
+        super().__init__(session_factory, Task, read_session_factory, single_flight)
+        # NOTIFY takes a global lock at commit that serializes writers, so it is only sent while events are served
+        self.notify = notify
 
-    async def get_all(self, pagination=None, **filters):
-        async with self.session_factory() as session:
-            stmt = select(self.model_class).options(selectinload(self.model_class.user))
-            if filters.get('status') is not None:
-                stmt = stmt.where(self.model_class.status == filters['status'])
+    @staticmethod
+    def _flight_key(pagination, shape, filters) -> Tuple:
+        return (tuple(pagination.model_dump().items()) if pagination is not None else None, shape,
+                tuple(sorted(filters.items())))
 
-            if pagination:
-                stmt = stmt.offset(pagination.offset).limit(pagination.page_size)
+    async def _touch(self, session, event: TaskEventType, changes: Dict[UUID, List[UUID]]):
+        # Bumped in the writing transaction so a committed change is never visible under an old list ETag.
+        # With notify on, the same statement queues one NOTIFY per user, delivered only if the transaction commits.
+        user_ids = sorted(user_id for user_id, ids in changes.items() if ids)
+        if not user_ids:
+            return
 
-            records = await session.execute(stmt)
-            return records.scalars().all()
+        touched = postgresql.insert(TaskChangeVersion).values([{"user_id": id, "version": 1} for id in user_ids])
+        touched = touched.on_conflict_do_update(index_elements=[TaskChangeVersion.user_id],
+                                                set_={"version": TaskChangeVersion.version + 1})
+        if not self.notify:
+            await session.execute(touched)
+            return
 
-    async def get(self, id: UUID):
+        touched = touched.returning(TaskChangeVersion.user_id, TaskChangeVersion.version).cte("touched")
+
+        # NOTIFY payloads are capped at 8000 bytes; past MAX_EVENT_IDS listeners are told to refetch instead
+        ids = json.dumps({str(user_id): [str(id) for id in changes[user_id]]
+                          if len(changes[user_id]) <= MAX_EVENT_IDS else None for user_id in user_ids})
+        payload = func.json_build_object(
+            "event", event.value, "user_id", touched.c.user_id, "version", touched.c.version,
+            "ids", cast(literal(ids), postgresql.JSONB).op("->")(cast(touched.c.user_id, Text)))
+        await session.execute(select(func.pg_notify(TASK_EVENTS_CHANNEL, cast(payload, Text))).select_from(touched))
+
+    async def get_change_version(self, user_id: UUID, primary: bool = False) -> int:
+        if primary:
+            async with self.primary_session_factory() as session:
+                return await self._read_change_version(session, user_id)
+        return await self._coalesce(("get_change_version", user_id), lambda: self._get_change_version(user_id))
+
+    async def _get_change_version(self, user_id: UUID) -> int:
+        async with self.read_session_factory() as session:
+            return await self._read_change_version(session, user_id)
+
+    @staticmethod
+    async def _read_change_version(session, user_id: UUID) -> int:
+        stmt = select(TaskChangeVersion.version).where(TaskChangeVersion.user_id == user_id)
+        record = await session.execute(stmt)
+        return record.scalar_one_or_none() or 0
+
+    async def create(self, data: TaskInDB):
         async with self.session_factory() as session:
-            stmt = select(self.model_class).where(self.model_class.id == id).options(
-                selectinload(self.model_class.user))
+            async with session.begin():
+                db_obj = self.model_class(**data.model_dump())
+                session.add(db_obj)
+                await session.flush()
+                await self._touch(session, TaskEventType.CREATED, {data.user_id: [db_obj.id]})
+                return db_obj
+
+    def _paginate(self, stmt, pagination, rank=None):
+        if rank is None:
+            stmt = stmt.order_by(self.model_class.id)
+        else:
+            stmt = stmt.add_columns(rank.label("rank")).order_by(rank.desc(), self.model_class.id)
+        if pagination is None:
+            return stmt
+
+        if pagination.cursor:
+            try:
+                if rank is None:
+                    last_id, = decode_cursor(pagination.cursor)
+                    stmt = stmt.where(self.model_class.id > UUID(last_id))
+                else:
+                    last_rank, last_id = decode_cursor(pagination.cursor)
+                    last_rank, last_id = float(last_rank), UUID(last_id)
+                    stmt = stmt.where(or_(rank < last_rank, and_(rank == last_rank, self.model_class.id > last_id)))
+            except ValueError:
+                raise InvalidCursorException(pagination.cursor)
+        else:
+            stmt = stmt.offset(pagination.offset)
+
+        return stmt.limit(pagination.page_size + 1)
+
+    @staticmethod
+    def _search_query(q: str):
+        return postgresql.websearch_to_tsquery(TASK_SEARCH_CONFIG, q)
+
+    def _rank(self, **filters):
+        if not filters.get('q'):
+            return None
+        return func.ts_rank(self.model_class.search_vector, self._search_query(filters['q']))
+
+    def _conditions(self, user_id: UUID | None = None, **filters):
+        conditions = []
+        if user_id is not None:
+            conditions.append(self.model_class.user_id == user_id)
+        if filters.get('status') is not None:
+            conditions.append(self.model_class.status == filters['status'])
+        if filters.get('q'):
+            conditions.append(self.model_class.search_vector.bool_op("@@")(self._search_query(filters['q'])))
+        return conditions
+
+    async def _count(self, session, conditions):
+        stmt = select(func.count()).select_from(self.model_class).where(*conditions)
+        result = await session.execute(stmt)
+        return result.scalar()
+
+    async def _estimate_count(self, session, conditions):
+        result = await session.execute(Explain(select(self.model_class.id).where(*conditions)))
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def _select_tasks(self):
+        return select(self.model_class.id, self.model_class.title, self.model_class.description,
+                      self.model_class.status, self.model_class.user_id, self.model_class.version)
+
+    def _select_records(self):
+        return self._select_tasks().add_columns(User.first_name, User.last_name, User.username).join(
+            User, self.model_class.user_id == User.id)
+
+    @staticmethod
+    def _to_task_record(row) -> TaskRowRecord:
+        id, title, description, status, user_id, version = row[:6]
+        return {"id": id, "title": title, "description": description, "status": status, "user_id": user_id,
+                "version": version}
+
+    @staticmethod
+    def _to_record(row) -> TaskRecord:
+        id, title, description, status, user_id, version, first_name, last_name, username = row[:9]
+        return {"id": id, "title": title, "description": description, "status": status, "user_id": user_id,
+                "version": version, "user": {"first_name": first_name, "last_name": last_name, "username": username}}
+
+    async def _fetch_users(self, session, user_ids) -> Dict[UUID, UserRecord]:
+        if not user_ids:
+            return {}
+
+        stmt = select(User.id, User.first_name, User.last_name, User.username).where(User.id.in_(user_ids))
+        records = await session.execute(stmt)
+        return {id: {"first_name": first_name, "last_name": last_name, "username": username}
+                for id, first_name, last_name, username in records}
+
+    async def _fetch_page(self, session, conditions, pagination, shape=ResponseShape.EMBEDDED,
+                          rank=None) -> TaskPage:
+        normalized = shape == ResponseShape.NORMALIZED
+        stmt = (self._select_tasks() if normalized else self._select_records()).where(*conditions)
+        to_record = self._to_task_record if normalized else self._to_record
+
+        records = await session.execute(self._paginate(stmt, pagination, rank))
+        rows = records.all()
+        items = [to_record(row) for row in rows]
+
+        total = None
+        next_cursor = None
+        if pagination is not None:
+            # A window count would make every page compute (and join) all matching rows before LIMIT, so the
+            # total is a second statement in the same session; a last offset page already knows it
+            last_page = not pagination.cursor and len(rows) <= pagination.page_size and (
+                rows or pagination.offset == 0)
+            if pagination.count == CountMode.EXACT:
+                total = pagination.offset + len(rows) if last_page else await self._count(session, conditions)
+            elif pagination.count == CountMode.ESTIMATE:
+                total = await self._estimate_count(session, conditions)
+
+            if len(items) > pagination.page_size:
+                items = items[:pagination.page_size]
+                if rank is None:
+                    next_cursor = encode_cursor(items[-1]["id"])
+                else:
+                    next_cursor = encode_cursor(rows[pagination.page_size - 1].rank, items[-1]["id"])
+
+        users = None
+        if normalized:
+            users = await self._fetch_users(session, {item["user_id"] for item in items})
+
+        return TaskPage(items, total, next_cursor, users)
+
+    async def get_all(self, pagination=None, shape=ResponseShape.EMBEDDED, **filters) -> TaskPage:
+        return await self._coalesce(("get_all", *self._flight_key(pagination, shape, filters)),
+                                    lambda: self._get_all(pagination, shape, **filters))
+
+    async def _get_all(self, pagination=None, shape=ResponseShape.EMBEDDED, **filters) -> TaskPage:
+        async with self.read_session_factory() as session:
+            return await self._fetch_page(session, self._conditions(**filters), pagination, shape,
+                                          self._rank(**filters))
+
+    async def _get(self, id: UUID) -> TaskRecord:
+        async with self.read_session_factory() as session:
+            stmt = self._select_records().where(self.model_class.id == id)
 
             record = await session.execute(stmt)
-            record = record.scalars().one_or_none()
+            record = record.one_or_none()
             if record is None:
                 raise ObjectNotFoundException(self.model_class.__name__, id)
 
-            return record
+            return self._to_record(record)
+
+    async def count(self, user_id: UUID | None = None, **filters):
+        return await self._coalesce(("count", user_id, tuple(sorted(filters.items()))),
+                                    lambda: self._count_where(user_id, **filters))
+
+    async def _count_where(self, user_id: UUID | None = None, **filters):
+        async with self.read_session_factory() as session:
+            return await self._count(session, self._conditions(user_id, **filters))
+
+    async def get_status_counts(self, user_id: UUID) -> Dict[TaskStatus, int]:
+        return await self._coalesce(("get_status_counts", user_id), lambda: self._get_status_counts(user_id))
+
+    async def _get_status_counts(self, user_id: UUID) -> Dict[TaskStatus, int]:
+        async with self.read_session_factory() as session:
+            stmt = select(TaskStatusCount.status, TaskStatusCount.count).where(TaskStatusCount.user_id == user_id)
+            records = await session.execute(stmt)
+            return {status: 0 for status in TaskStatus} | {status: count for status, count in records}
+
+    async def rebuild_status_counts(self, user_id: UUID | None = None) -> int:
+        stale = delete(TaskStatusCount)
+        counts = select(self.model_class.user_id, self.model_class.status, func.count()).group_by(
+            self.model_class.user_id, self.model_class.status)
+        if user_id is not None:
+            stale = stale.where(TaskStatusCount.user_id == user_id)
+            counts = counts.where(self.model_class.user_id == user_id)
 
-    async def count(self, **filters):
         async with self.session_factory() as session:
-            stmt = select(func.count()).select_from(self.model_class)
+            async with session.begin():
+                # SHARE mode waits for in-flight task writes and holds new ones until the rebuild commits
+                await session.execute(text("LOCK TABLE task IN SHARE MODE"))
+                await session.execute(stale)
+                result = await session.execute(
+                    insert(TaskStatusCount).from_select(["user_id", "status", "count"], counts))
+                return result.rowcount
+
+    def _owned(self, id: UUID, user_id: UUID, expected_version: int | None = None):
+        conditions = [self.model_class.id == id, self.model_class.user_id == user_id]
+        if expected_version is not None:
+            conditions.append(self.model_class.version == expected_version)
+        return conditions
+
+    async def _raise_missing(self, session, id: UUID, user_id: UUID, expected_version: int | None):
+        if expected_version is not None:
+            stmt = select(self.model_class.id).where(*self._owned(id, user_id))
+            if (await session.execute(stmt)).scalar_one_or_none() is not None:
+                raise VersionConflictException(self.model_class.__name__, id, expected_version)
 
-            if filters.get('status') is not None:
-                stmt = stmt.where(self.model_class.status == filters['status'])
+        raise ObjectNotFoundException(self.model_class.__name__, id)
 
-            result = await session.execute(stmt)
-            return result.scalar()
+    async def delete_user_task(self, id: UUID, user_id: UUID, expected_version: int | None = None):
+        stmt = delete(self.model_class).where(*self._owned(id, user_id, expected_version)).returning(
+            self.model_class.id).execution_options(synchronize_session=False)
 
-    async def delete_user_task(self, id: UUID, user_id: UUID):
         async with self.session_factory() as session:
             async with session.begin():
-                stmt = select(self.model_class).where(
-                    (self.model_class.id == id) & (self.model_class.user_id == user_id)).with_for_update()
                 record = await session.execute(stmt)
-                record = record.scalars().one_or_none()
+                if record.scalar_one_or_none() is None:
+                    await self._raise_missing(session, id, user_id, expected_version)
+                await self._touch(session, TaskEventType.DELETED, {user_id: [id]})
 
-                if record is None:
-                    raise ObjectNotFoundException(self.model_class.__name__, id)
+    async def update_user_task(self, id: UUID, user_id: UUID, data: TaskUpdateInDB,
+                               expected_version: int | None = None):
+        update_data = data.model_dump(exclude_unset=True, exclude_none=True)
+        conditions = self._owned(id, user_id, expected_version)
+        if update_data:
+            stmt = update(self.model_class).where(*conditions).values(
+                **update_data, version=self.model_class.version + 1).returning(self.model_class)
+        else:
+            stmt = select(self.model_class).where(*conditions)
 
-                await session.delete(record)
-
-    async def update_user_task(self, id: UUID, user_id: UUID, data: TaskInDB):
         async with self.session_factory() as session:
             async with session.begin():
-                stmt = select(self.model_class).where(
-                    (self.model_class.id == id) & (self.model_class.user_id == user_id)).with_for_update()
                 record = await session.execute(stmt)
                 obj = record.scalars().one_or_none()
 
                 if obj is None:
-                    raise ObjectNotFoundException(self.model_class.__name__, id)
-
-                update_data = data.model_dump(exclude_unset=True, exclude_none=True)
-                for field, val in update_data.items():
-                    setattr(obj, field, val)
+                    await self._raise_missing(session, id, user_id, expected_version)
+                if update_data:
+                    await self._touch(session, TaskEventType.UPDATED, {user_id: [id]})
 
-                await session.flush()
                 return obj
 
-    async def get_user_task(self, user_id: UUID, pagination=None, **filters):
+    async def get_user_task(self, user_id: UUID, pagination=None, shape=ResponseShape.EMBEDDED,
+                            **filters) -> TaskPage:
+        return await self._coalesce(("get_user_task", user_id, *self._flight_key(pagination, shape, filters)),
+                                    lambda: self._get_user_task(user_id, pagination, shape, **filters))
+
+    async def _get_user_task(self, user_id: UUID, pagination=None, shape=ResponseShape.EMBEDDED,
+                             **filters) -> TaskPage:
+        async with self.read_session_factory() as session:
+            return await self._fetch_page(session, self._conditions(user_id, **filters), pagination, shape,
+                                          self._rank(**filters))
+
+    async def get_versioned_user_task(self, user_id: UUID, pagination=None, shape=ResponseShape.EMBEDDED,
+                                      **filters) -> Tuple[int, TaskPage]:
+        return await self._coalesce(
+            ("get_versioned_user_task", user_id, *self._flight_key(pagination, shape, filters)),
+            lambda: self._get_versioned_user_task(user_id, pagination, shape, **filters))
+
+    async def _get_versioned_user_task(self, user_id: UUID, pagination=None, shape=ResponseShape.EMBEDDED,
+                                       **filters) -> Tuple[int, TaskPage]:
+        # One session with the version read first: whichever replica serves it, the page is at least as new as
+        # the version, so the page's ETag can be stale-low but never ahead of the body
+        async with self.read_session_factory() as session:
+            version = await self._read_change_version(session, user_id)
+            return version, await self._fetch_page(session, self._conditions(user_id, **filters), pagination, shape,
+                                                   self._rank(**filters))
+
+    async def stream_user_tasks(self, user_id: UUID, batch_size: int = 1000,
+                                **filters) -> AsyncIterator[List[TaskRowRecord]]:
+        # A server-side cursor fetches batch_size rows per round trip; the next batch is only
+        # requested once the caller has consumed the previous one
+        stmt = self._select_tasks().where(*self._conditions(user_id, **filters)).order_by(
+            self.model_class.id).execution_options(yield_per=batch_size)
+
+        async with self.read_session_factory() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                yield [self._to_task_record(row) for row in rows]
+
+    async def create_many(self, tasks: List[TaskInDB]) -> List[UUID]:
         async with self.session_factory() as session:
-            stmt = select(self.model_class).where(self.model_class.user_id == user_id).options(
-                selectinload(self.model_class.user))
-            if filters.get('status') is not None:
-                stmt = stmt.where(self.model_class.status == filters['status'])
+            async with session.begin():
+                stmt = insert(self.model_class).values([task.model_dump() for task in tasks]).returning(
+                    self.model_class.id)
+                result = await session.execute(stmt)
+                changes = {}
+                for task in tasks:
+                    changes.setdefault(task.user_id, []).append(task.id)
+                await self._touch(session, TaskEventType.CREATED, changes)
+                return result.scalars().all()
 
-            if pagination:
-                stmt = stmt.offset(pagination.offset).limit(pagination.page_size)
+    async def copy_user_tasks(self, user_id: UUID, tasks: List[TaskCreate]) -> int:
+        # The enum column stores member names, and COPY bypasses SQLAlchemy's Enum type
+        records = [(uuid4(), task.title, task.description, task.status.name, user_id, 1) for task in tasks]
 
-            record = await session.execute(stmt)
-            record = record.scalars().all()
-            if record is None:
-                raise ObjectNotFoundException(self.model_class.__name__, id)
+        async with self.session_factory() as session:
+            async with session.begin():
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    self.model_class.__tablename__, records=records, columns=COPY_COLUMNS)
+                await self._touch(session, TaskEventType.CREATED, {user_id: [record[0] for record in records]})
+        return len(records)
 
-            return record
+    async def update_user_tasks(self, user_id: UUID, tasks: List[TaskBatchUpdate]) -> List[UUID]:
+        columns = self.model_class.__table__.c
+        changes = values(column("id", columns.id.type),
+                         column("title", columns.title.type),
+                         column("description", columns.description.type),
+                         column("status", columns.status.type),
+                         name="changes").data([(task.id, task.title, task.description, task.status) for task in tasks])
+
+        stmt = update(self.model_class).where(
+            (self.model_class.id == changes.c.id) & (self.model_class.user_id == user_id)
+        ).values(
+            title=func.coalesce(cast(changes.c.title, columns.title.type), self.model_class.title),
+            description=func.coalesce(cast(changes.c.description, columns.description.type),
+                                      self.model_class.description),
+            status=func.coalesce(cast(changes.c.status, columns.status.type), self.model_class.status),
+            version=self.model_class.version + 1,
+        ).returning(self.model_class.id).execution_options(synchronize_session=False)
+
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.execute(stmt)
+                changed = result.scalars().all()
+                await self._touch(session, TaskEventType.UPDATED, {user_id: changed})
+                return changed
+
+    async def delete_user_tasks(self, user_id: UUID, ids: List[UUID]) -> List[UUID]:
+        ids_param = bindparam("ids", ids, type_=postgresql.ARRAY(self.model_class.__table__.c.id.type))
+        stmt = delete(self.model_class).where(
+            (self.model_class.id == any_(ids_param)) & (self.model_class.user_id == user_id)
+        ).returning(self.model_class.id).execution_options(synchronize_session=False)
+
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.execute(stmt)
+                changed = result.scalars().all()
+                await self._touch(session, TaskEventType.DELETED, {user_id: changed})
+                return changed
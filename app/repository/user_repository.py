@@ -1,16 +1,43 @@
+from uuid import UUID
+
 from sqlalchemy.future import select
 
+from app.core.cache import SingleFlight, TTLCache
+from app.core.database import after_commit
 from app.models.user import User
 from app.repository.base_repository import BaseRepository
 from app.schemas.user import UserInDB
 
 
 class UserRepository(BaseRepository[User, UserInDB, UserInDB]):
-    def __init__(self, session_factory):
-        super().__init__(session_factory, User)
+    def __init__(self, session_factory, read_session_factory=None, user_cache: TTLCache | None = None,
+                 single_flight: SingleFlight | None = None):
+        super().__init__(session_factory, User, read_session_factory, single_flight)
+        self.user_cache = user_cache
+
+    async def update(self, id: UUID, data: UserInDB):
+        try:
+            return await super().update(id, data)
+        finally:
+            self._invalidate(id)
+
+    async def delete(self, id: UUID):
+        try:
+            return await super().delete(id)
+        finally:
+            self._invalidate(id)
+
+    def _invalidate(self, id: UUID):
+        # Inside a request session the change is not visible until the request commits; dropping the entry any
+        # earlier lets a concurrent request cache the old principal again
+        if self.user_cache is not None:
+            after_commit(lambda: self.user_cache.invalidate(UUID(str(id))))
 
     async def get_by_username(self, username: str) -> User:
-        async with self.session_factory() as session:
+        return await self._coalesce(("get_by_username", username), lambda: self._get_by_username(username))
+
+    async def _get_by_username(self, username: str) -> User:
+        async with self.read_session_factory() as session:
             stmt = select(self.model_class).where(self.model_class.username == username)
             record = await session.execute(stmt)
 
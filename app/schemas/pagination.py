@@ -1,11 +1,41 @@
-from typing import List
+import base64
+import json
+from enum import Enum
+from typing import Any, List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
 
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([str(value) for value in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> List[str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed pagination cursor")
+
+    # encode_cursor only writes strings; anything else was not issued by us
+    if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values):
+        raise ValueError("Malformed pagination cursor")
+    return values
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
 class PaginationParams(BaseModel):
     page: int = Field(default=1, ge=1, description="Page number")
     page_size: int = Field(default=10, ge=1, le=100, description="Items per page")
+    cursor: Optional[str] = Field(default=None, description="Opaque cursor from a previous page's next_cursor")
+    count: CountMode = Field(default=CountMode.EXACT,
+                             description="How to compute total: exact, planner estimate, or skip it")
 
     @property
     def offset(self) -> int:
@@ -15,8 +45,9 @@ class PaginationParams(BaseModel):
 class PaginationResponse[T](BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
-    items: List[T] | T
-    total: int
+    items: List[T]
+    total: Optional[int] = None
     page: int
     page_size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
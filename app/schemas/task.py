@@ -1,8 +1,8 @@
 from enum import Enum
-from typing import Optional
+from typing import Dict, List, NamedTuple, Optional, TypedDict
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 from app.schemas.user import UserBase
 from app.models.enum import TaskStatus
@@ -28,6 +28,7 @@ class TaskUpdate(BaseModel):
 class TaskResponse(TaskBase):
     id: UUID
     user_id: UUID
+    version: int = Field(default=1)
     user: UserBase
 
 
@@ -39,3 +40,111 @@ class TaskInDB(TaskBase):
 class TaskUpdateInDB(TaskUpdate):
     model_config = ConfigDict(from_attributes=True)
     status: Optional[TaskStatus] = Field(default=None)
+
+
+class TaskBatchUpdate(TaskUpdateInDB):
+    id: UUID
+
+
+class BatchItemStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    NOT_FOUND = "not_found"
+
+
+class TaskBatchResult(BaseModel):
+    id: UUID
+    status: BatchItemStatus
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class TaskImportChunk(BaseModel):
+    chunk: int
+    rows: int
+    imported: int
+    errors: List[ImportRowError] = Field(default_factory=list)
+    error: Optional[str] = Field(default=None)
+
+
+class TaskImportReport(BaseModel):
+    imported: int = Field(default=0)
+    rejected: int = Field(default=0)
+    chunks: List[TaskImportChunk] = Field(default_factory=list)
+
+
+class TaskStatusSummary(BaseModel):
+    counts: Dict[TaskStatus, int]
+    total: int
+
+
+class UserRecord(TypedDict):
+    first_name: str
+    last_name: Optional[str]
+    username: str
+
+
+class TaskRowRecord(TypedDict):
+    id: UUID
+    title: str
+    description: Optional[str]
+    status: TaskStatus
+    user_id: UUID
+    version: int
+
+
+class TaskRecord(TaskRowRecord):
+    user: UserRecord
+
+
+class TaskPageRecord(TypedDict):
+    items: List[TaskRecord]
+    total: Optional[int]
+    page: int
+    page_size: int
+    pages: Optional[int]
+    next_cursor: Optional[str]
+
+
+class NormalizedTaskPageRecord(TypedDict):
+    items: List[TaskRowRecord]
+    users: Dict[UUID, UserRecord]
+    total: Optional[int]
+    page: int
+    page_size: int
+    pages: Optional[int]
+    next_cursor: Optional[str]
+
+
+class ResponseShape(str, Enum):
+    EMBEDDED = "embedded"
+    NORMALIZED = "normalized"
+
+
+class TaskFileFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class TaskEventType(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
+class TaskPage(NamedTuple):
+    items: List[TaskRecord] | List[TaskRowRecord]
+    total: Optional[int]
+    next_cursor: Optional[str]
+    users: Optional[Dict[UUID, UserRecord]] = None
+
+
+# Plain rows are serialized straight to JSON bytes by pydantic-core, skipping model validation
+task_serializer = TypeAdapter(TaskRecord)
+task_row_serializer = TypeAdapter(TaskRowRecord)
+task_page_serializer = TypeAdapter(TaskPageRecord)
+normalized_task_page_serializer = TypeAdapter(NormalizedTaskPageRecord)
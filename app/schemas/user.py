@@ -1,4 +1,5 @@
 from typing import Optional
+from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -17,3 +18,7 @@ class UserCreate(UserBase):
 
 class UserInDB(UserBase):
     password: str
+
+
+class UserPrincipal(UserBase):
+    id: UUID
@@ -1,30 +1,63 @@
+import math
+from uuid import UUID
+
 from fastapi import HTTPException, Request, Response, status
 from jose import JWTError
 
-from app.core.exceptions import ObjectNotFoundException
-from app.core.security import (create_tokens, decode_token, hash_password,
-                               verify_password)
+from app.core.cache import TTLCache
+from app.core.exceptions import (ObjectNotFoundException,
+                                 PasswordHasherBusyException)
+from app.core.rate_limit import Limit, RateLimitBackend
+from app.core.security import (create_tokens, decode_token,
+                               hash_password_async, verify_password_async)
 from app.models.user import User
 from app.repository.user_repository import UserRepository
 from app.schemas.auth import LoginRequest
-from app.schemas.user import UserCreate, UserInDB
+from app.schemas.user import UserCreate, UserInDB, UserPrincipal
 from app.services.base_service import BaseService
 
 
 class AuthService(BaseService[User, UserInDB, UserCreate, UserRepository]):
-    def __init__(self, user_repository: UserRepository):
+    def __init__(self, user_repository: UserRepository, user_cache: TTLCache | None = None,
+                 rate_limiter: RateLimitBackend | None = None, username_limit: Limit | None = None):
         self.user_repository = user_repository
+        self.user_cache = user_cache
+        self.rate_limiter = rate_limiter
+        self.username_limit = username_limit
         super().__init__(user_repository)
 
+    async def get_principal(self, user_id: UUID | str) -> UserPrincipal:
+        user_id = UUID(str(user_id))
+        if self.user_cache is not None:
+            principal = self.user_cache.get(user_id)
+            if principal is not None:
+                return principal
+
+        principal = UserPrincipal.model_validate(await self.get(user_id))
+        if self.user_cache is not None:
+            self.user_cache.set(user_id, principal)
+        return principal
+
+    @staticmethod
+    def _busy_exception() -> HTTPException:
+        return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                             detail="Too many authentication requests, try again later",
+                             headers={"Retry-After": "1"})
+
     async def register(self, user: UserCreate, response: Response):
         if await self.user_repository.get_by_username(user.username):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
 
+        try:
+            hashed_password = await hash_password_async(user.password)
+        except PasswordHasherBusyException:
+            raise self._busy_exception()
+
         db_user = UserInDB(
             username=user.username,
             last_name=user.last_name,
             first_name=user.first_name,
-            password=hash_password(user.password),
+            password=hashed_password,
         )
 
         user = await self.repository.create(db_user)
@@ -47,9 +80,26 @@ class AuthService(BaseService[User, UserInDB, UserCreate, UserRepository]):
 
         return {"message": "Successfully registered", "user_id": user.id}
 
+    async def _check_username_limit(self, username: str):
+        # Per-IP limits don't stop a password spray against one account from many addresses
+        if self.rate_limiter is None or self.username_limit is None:
+            return
+
+        retry_after = await self.rate_limiter.acquire(f"login:username:{username.lower()}", self.username_limit)
+        if retry_after > 0:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail="Too many login attempts for this user, try again later",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+
     async def login(self, sign_in_data: LoginRequest, response: Response):
+        await self._check_username_limit(sign_in_data.username)
         user = await self.user_repository.get_by_username(sign_in_data.username)
-        if not user or not verify_password(sign_in_data.password, user.password):
+        try:
+            verified = user is not None and await verify_password_async(sign_in_data.password, user.password)
+        except PasswordHasherBusyException:
+            raise self._busy_exception()
+
+        if not verified:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect username or password")
 
         access_token, refresh_token = create_tokens(user.id)
@@ -1,24 +1,116 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+from typing import AsyncIterator, FrozenSet, List, Optional, Tuple
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
 
-from app.core.exceptions import ObjectNotFoundException
+from app.core.change_feed import ChangeFeed
+from app.core.exceptions import (InvalidCursorException,
+                                 ObjectNotFoundException,
+                                 VersionConflictException)
+from app.core.write_combiner import WriteCombiner
 from app.models.task import Task
 from app.repository.task_repository import TaskRepository
-from app.schemas.pagination import PaginationResponse
-from app.schemas.task import TaskInDB, TaskUpdateInDB
+from app.schemas.pagination import PaginationParams
+from app.schemas.task import (BatchItemStatus, ImportRowError, ResponseShape,
+                              TaskBatchResult, TaskBatchUpdate, TaskCreate,
+                              TaskFileFormat, TaskImportChunk,
+                              TaskImportReport, TaskInDB, TaskPage,
+                              TaskRowRecord, TaskStatusSummary, TaskUpdateInDB,
+                              normalized_task_page_serializer,
+                              task_page_serializer, task_row_serializer,
+                              task_serializer)
 from app.services.base_service import BaseService
 
+EXPORT_COLUMNS = ("id", "title", "description", "status", "user_id", "version")
+
+EVENT_RETRY_MS = 3000
+
+EXPORT_MEDIA_TYPES = {
+    TaskFileFormat.NDJSON: "application/x-ndjson",
+    TaskFileFormat.CSV: "text/csv",
+}
+
 
 class TaskService(BaseService[Task, TaskInDB, TaskUpdateInDB, TaskRepository]):
-    def __init__(self, task_repository: TaskRepository):
+    def __init__(self, task_repository: TaskRepository, export_batch_size: int = 1000,
+                 import_chunk_size: int = 10000, import_max_errors: int = 1000,
+                 create_combiner: Optional[WriteCombiner[TaskInDB, UUID]] = None,
+                 change_feed: Optional[ChangeFeed] = None, event_heartbeat_seconds: float = 15):
         super().__init__(task_repository)
         self.task_repository = task_repository
+        self.export_batch_size = export_batch_size
+        self.import_chunk_size = import_chunk_size
+        self.import_max_errors = import_max_errors
+        self.create_combiner = create_combiner
+        self.change_feed = change_feed
+        self.event_heartbeat_seconds = event_heartbeat_seconds
+
+    @staticmethod
+    def _list_etag(user_id: UUID, change_version: int, pagination: Optional[PaginationParams], shape: ResponseShape,
+                   filters) -> str:
+        key = json.dumps([str(user_id), change_version, pagination.model_dump(mode="json") if pagination else None,
+                          shape, filters], sort_keys=True, default=str)
+        return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+    @staticmethod
+    def _not_modified(etag: str, if_none_match: Optional[FrozenSet[str]]) -> bool:
+        return bool(if_none_match) and (etag in if_none_match or "*" in if_none_match)
+
+    @staticmethod
+    def _cache_headers(etag: str) -> dict:
+        return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    def _page_response(self, page: TaskPage, pagination: PaginationParams, etag: Optional[str] = None) -> Response:
+        total_pages = None
+        if page.total is not None:
+            total_pages = (page.total + pagination.page_size - 1) // pagination.page_size
+
+        content = {
+            "items": page.items,
+            "total": page.total,
+            "page": pagination.page,
+            "page_size": pagination.page_size,
+            "pages": total_pages,
+            "next_cursor": page.next_cursor,
+        }
+        headers = self._cache_headers(etag) if etag else None
+        if page.users is not None:
+            content["users"] = page.users
+            return Response(content=normalized_task_page_serializer.dump_json(content), media_type="application/json",
+                            headers=headers)
+        return Response(content=task_page_serializer.dump_json(content), media_type="application/json",
+                        headers=headers)
+
+    async def create(self, data: TaskInDB):
+        if self.create_combiner is None:
+            return await super().create(data)
+
+        try:
+            await self.create_combiner.submit(data)
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
+            )
+        return JSONResponse(status_code=status.HTTP_201_CREATED, content="created")
 
-    async def get(self, id: UUID):
+    async def get(self, id: UUID, if_none_match: Optional[FrozenSet[str]] = None):
         try:
-            return await self.task_repository.get(id)
+            record = await self.task_repository.get(id)
+
+            # The task version doubles as its ETag, so the same value works for If-Match on writes
+            etag = f'"{record["version"]}"'
+            if self._not_modified(etag, if_none_match):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self._cache_headers(etag))
+            return Response(content=task_serializer.dump_json(record), media_type="application/json",
+                            headers=self._cache_headers(etag))
         except ObjectNotFoundException:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"object with id {id} not found"
@@ -32,27 +124,31 @@ class TaskService(BaseService[Task, TaskInDB, TaskUpdateInDB, TaskRepository]):
         try:
             pagination = filters.pop("pagination", None)
 
-            items = await self.task_repository.get_all(pagination, **filters)
-
-            total_items = await self.task_repository.count(**filters)
-
-            total_pages = (total_items + pagination.page_size - 1) // pagination.page_size
+            shape = filters.pop("shape", ResponseShape.EMBEDDED)
 
-            return PaginationResponse(
-                items=items,
-                total=total_items,
-                page=pagination.page,
-                page_size=pagination.page_size,
-                pages=total_pages
+            page = await self.task_repository.get_all(pagination, shape, **filters)
+            return self._page_response(page, pagination)
+        except InvalidCursorException as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
             )
+
+    async def get_status_summary(self, user_id: UUID) -> TaskStatusSummary:
+        try:
+            counts = await self.task_repository.get_status_counts(user_id)
         except Exception:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
             )
+        return TaskStatusSummary(counts=counts, total=sum(counts.values()))
 
-    async def delete_user_task(self, id: UUID, user_id: UUID):
+    async def delete_user_task(self, id: UUID, user_id: UUID, expected_version: int | None = None):
         try:
-            await self.task_repository.delete_user_task(id, user_id)
+            await self.task_repository.delete_user_task(id, user_id, expected_version)
+        except VersionConflictException as e:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e))
         except ObjectNotFoundException as e:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
@@ -63,9 +159,12 @@ class TaskService(BaseService[Task, TaskInDB, TaskUpdateInDB, TaskRepository]):
             )
         return JSONResponse(status_code=status.HTTP_204_NO_CONTENT, content="deleted")
 
-    async def update_user_task(self, id: UUID, user_id: UUID, task: TaskUpdateInDB):
+    async def update_user_task(self, id: UUID, user_id: UUID, task: TaskUpdateInDB,
+                               expected_version: int | None = None):
         try:
-            return await self.task_repository.update_user_task(id, user_id, task)
+            return await self.task_repository.update_user_task(id, user_id, task, expected_version)
+        except VersionConflictException as e:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e))
         except ObjectNotFoundException:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"object with id {id} not found"
@@ -79,22 +178,239 @@ class TaskService(BaseService[Task, TaskInDB, TaskUpdateInDB, TaskRepository]):
         try:
             pagination = filters.pop("pagination", None)
 
-            items = await self.task_repository.get_user_task(user_id, pagination, **filters)
+            shape = filters.pop("shape", ResponseShape.EMBEDDED)
 
-            total_items = await self.task_repository.count(**filters)
+            if_none_match = filters.pop("if_none_match", None)
 
-            total_pages = (total_items + pagination.page_size - 1) // pagination.page_size
+            if if_none_match:
+                change_version = await self.task_repository.get_change_version(user_id)
+                etag = self._list_etag(user_id, change_version, pagination, shape, filters)
+                if self._not_modified(etag, if_none_match):
+                    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self._cache_headers(etag))
 
-            return PaginationResponse(
-                items=items,
-                total=total_items,
-                page=pagination.page,
-                page_size=pagination.page_size,
-                pages=total_pages
-            )
+            # The ETag sent with a body must come from the version read alongside that page; one read separately
+            # may have come from a replica further ahead and would let clients keep a stale page under it
+            change_version, page = await self.task_repository.get_versioned_user_task(user_id, pagination, shape,
+                                                                                      **filters)
+            return self._page_response(page, pagination,
+                                       self._list_etag(user_id, change_version, pagination, shape, filters))
+        except InvalidCursorException as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         except ObjectNotFoundException:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="objects not found")
         except Exception:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
             )
+
+    async def create_many(self, tasks: List[TaskInDB]) -> List[TaskBatchResult]:
+        try:
+            created = await self.task_repository.create_many(tasks)
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
+            )
+        return [TaskBatchResult(id=id, status=BatchItemStatus.CREATED) for id in created]
+
+    async def update_user_tasks(self, user_id: UUID, tasks: List[TaskBatchUpdate]) -> List[TaskBatchResult]:
+        try:
+            updated = set(await self.task_repository.update_user_tasks(user_id, tasks))
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
+            )
+        return [TaskBatchResult(id=task.id,
+                                status=BatchItemStatus.UPDATED if task.id in updated else BatchItemStatus.NOT_FOUND)
+                for task in tasks]
+
+    async def delete_user_tasks(self, user_id: UUID, ids: List[UUID]) -> List[TaskBatchResult]:
+        try:
+            deleted = set(await self.task_repository.delete_user_tasks(user_id, ids))
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
+            )
+        return [TaskBatchResult(id=id, status=BatchItemStatus.DELETED if id in deleted else BatchItemStatus.NOT_FOUND)
+                for id in ids]
+
+    @staticmethod
+    def _encode_ndjson(records: List[TaskRowRecord]) -> bytes:
+        return b"".join(task_row_serializer.dump_json(record) + b"\n" for record in records)
+
+    @staticmethod
+    def _encode_csv(records: List[TaskRowRecord], header: bool = False) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_COLUMNS)
+        writer.writerows([record["id"], record["title"], record["description"], record["status"].value,
+                          record["user_id"], record["version"]] for record in records)
+        return buffer.getvalue().encode()
+
+    async def export_user_tasks(self, user_id: UUID, export_format: TaskFileFormat, **filters) -> StreamingResponse:
+        batches = self.task_repository.stream_user_tasks(user_id, self.export_batch_size, **filters)
+
+        # Pull the first batch before any byte is sent so a failing query still turns into a proper 500
+        try:
+            first = await anext(batches, [])
+        except Exception:
+            await batches.aclose()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
+            )
+
+        async def body():
+            try:
+                if export_format == TaskFileFormat.CSV:
+                    yield self._encode_csv(first, header=True)
+                    async for batch in batches:
+                        yield self._encode_csv(batch)
+                else:
+                    yield self._encode_ndjson(first)
+                    async for batch in batches:
+                        yield self._encode_ndjson(batch)
+            finally:
+                await batches.aclose()
+
+        return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES[export_format],
+                                 headers={"Content-Disposition": f'attachment; filename="tasks.{export_format.value}"'})
+
+    @staticmethod
+    def _sse(event: str, data: dict, id: Optional[int] = None) -> str:
+        lines = [f"event: {event}", f"data: {json.dumps(data, separators=(',', ':'), default=str)}"]
+        if id is not None:
+            lines.insert(0, f"id: {id}")
+        return "\n".join(lines) + "\n\n"
+
+    async def stream_user_events(self, user_id: UUID, last_event_id: Optional[str] = None) -> StreamingResponse:
+        if self.change_feed is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task event stream is disabled")
+        try:
+            await self.change_feed.start()
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Task event stream is unavailable"
+            )
+
+        async def body():
+            async with self.change_feed.subscribe(user_id) as queue:
+                # Read after subscribing, from the primary and never from a shared in-flight read: a replica
+                # could be behind, and changes between its snapshot and LISTEN would never reach this stream
+                version = await self.task_repository.get_change_version(user_id, primary=True)
+
+                # Event ids are the per-user change version, so a reconnecting client's Last-Event-ID says
+                # whether it missed anything while it was away
+                missed = last_event_id is not None and last_event_id != str(version)
+                yield f"retry: {EVENT_RETRY_MS}\n\n"
+                yield self._sse("resync" if missed else "ready", {"version": version}, version)
+
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), self.event_heartbeat_seconds)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield self._sse(event["event"], event, event.get("version"))
+
+        return StreamingResponse(body(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @staticmethod
+    async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        buffer = b""
+        async for data in body:
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
+
+    @staticmethod
+    def _describe(error: ValidationError) -> str:
+        return "; ".join(f"{'.'.join(map(str, item['loc'])) or 'row'}: {item['msg']}" for item in error.errors())
+
+    @classmethod
+    async def _parse_ndjson(cls, body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, TaskCreate | str]]:
+        row = 0
+        async for line in cls._lines(body):
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                yield row, TaskCreate.model_validate_json(line)
+            except ValidationError as e:
+                yield row, cls._describe(e)
+
+    @classmethod
+    async def _parse_csv(cls, body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, TaskCreate | str]]:
+        header = None
+        record = ""
+        row = 0
+        async for line in cls._lines(body):
+            text = line.decode(errors="replace")
+            record = f"{record}\n{text}" if record else text
+            # An odd number of quotes means a quoted field continues on the next line
+            if record.count('"') % 2:
+                continue
+
+            values, record = next(csv.reader([record]), []), ""
+            if not any(value.strip() for value in values):
+                continue
+            if header is None:
+                header = [name.strip().lstrip("\ufeff") for name in values]
+                continue
+
+            row += 1
+            try:
+                yield row, TaskCreate.model_validate({name: value for name, value in zip(header, values) if value})
+            except ValidationError as e:
+                yield row, cls._describe(e)
+
+        if record:
+            yield row + 1, "unterminated quoted field"
+
+    async def _import_chunk(self, report: TaskImportReport, user_id: UUID, tasks: List[TaskCreate],
+                            errors: List[ImportRowError], rows: int):
+        chunk = TaskImportChunk(chunk=len(report.chunks) + 1, rows=rows, imported=0, errors=errors)
+        if tasks:
+            try:
+                chunk.imported = await self.task_repository.copy_user_tasks(user_id, tasks)
+            except Exception as e:
+                logging.error(f"Task import chunk {chunk.chunk} failed: {e}")
+                chunk.error = "chunk could not be written"
+
+        report.imported += chunk.imported
+        report.rejected += rows - chunk.imported
+        report.chunks.append(chunk)
+
+    async def import_user_tasks(self, user_id: UUID, import_format: TaskFileFormat,
+                                body: AsyncIterator[bytes]) -> TaskImportReport:
+        parsed = self._parse_csv(body) if import_format == TaskFileFormat.CSV else self._parse_ndjson(body)
+        report = TaskImportReport()
+        tasks, errors, rows, recorded_errors = [], [], 0, 0
+        pending = None
+
+        # Each chunk is COPYed in the background while the next one is parsed and validated;
+        # chunks still commit one at a time and in order
+        try:
+            async for row, task in parsed:
+                rows += 1
+                if isinstance(task, TaskCreate):
+                    tasks.append(task)
+                elif recorded_errors < self.import_max_errors:
+                    errors.append(ImportRowError(row=row, error=task))
+                    recorded_errors += 1
+
+                if rows == self.import_chunk_size:
+                    if pending is not None:
+                        await pending
+                    pending = asyncio.create_task(self._import_chunk(report, user_id, tasks, errors, rows))
+                    tasks, errors, rows = [], [], 0
+        finally:
+            if pending is not None:
+                await pending
+
+        if rows:
+            await self._import_chunk(report, user_id, tasks, errors, rows)
+        return report
@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+import time
+import uuid
+
+for name, value in {"SECRET_KEY": "benchmark-secret", "POSTGRES_USER": "postgres",
+                    "POSTGRES_PASSWORD": "postgres", "POSTGRES_HOST": "localhost",
+                    "POSTGRES_PORT": "5432", "POSTGRES_DB": "benchmark"}.items():
+    os.environ.setdefault(name, value)
+
+from jose import jwt  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import (create_tokens, decode_token,  # noqa: E402
+                               token_cache)
+
+
+def uncached_decode(token: str):
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def measure(func, token: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(token)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    access_token, _ = create_tokens(uuid.uuid4())
+    token_cache.clear()
+    decode_token(access_token)
+
+    uncached = measure(uncached_decode, access_token, args.iterations)
+    cached = measure(decode_token, access_token, args.iterations)
+
+    print(json.dumps({
+        "iterations": args.iterations,
+        "uncached_us_per_request": round(uncached, 3),
+        "cached_us_per_request": round(cached, 3),
+        "speedup": round(uncached / cached, 1),
+        "cache": token_cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.seed import PASSWORD
+
+ENDPOINTS = ("user_tasks", "tasks", "login", "update_task")
+STATUSES = ("New", "In progress", "Completed")
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    # Nearest rank on pre-sorted samples
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Session:
+    def __init__(self, client: httpx.AsyncClient, username: str, task_ids: List[str]):
+        self.client = client
+        self.username = username
+        self.task_ids = task_ids
+
+
+def request_factory(endpoint: str, api: str, page_size: int) -> Callable[[Session, random.Random], Awaitable]:
+    async def user_tasks(session, rng):
+        return await session.client.get(f"{api}/user/tasks", params={"page_size": page_size})
+
+    async def tasks(session, rng):
+        return await session.client.get(f"{api}/tasks", params={"page_size": page_size})
+
+    async def login(session, rng):
+        return await session.client.post(f"{api}/auth/login",
+                                         json={"username": session.username, "password": PASSWORD})
+
+    async def update_task(session, rng):
+        return await session.client.patch(f"{api}/user/task",
+                                          params={"task_id": rng.choice(session.task_ids),
+                                                  "status": rng.choice(STATUSES)},
+                                          json={"title": f"Benchmark update {rng.random():.6f}"})
+
+    return {"user_tasks": user_tasks, "tasks": tasks, "login": login, "update_task": update_task}[endpoint]
+
+
+async def open_sessions(base_url: str, api: str, count: int, users: int, rng: random.Random,
+                        timeout: float) -> List[Session]:
+    sessions = []
+    for index in rng.sample(range(1, users + 1), min(count, users)):
+        client = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+        username = f"bench_{index}"
+        response = await client.post(f"{api}/auth/login", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        page = await client.get(f"{api}/user/tasks", params={"page_size": 100, "count": "none"})
+        page.raise_for_status()
+        sessions.append(Session(client, username, [item["id"] for item in page.json()["items"]]))
+    return sessions
+
+
+async def drive(endpoint: str, sessions: List[Session], api: str, concurrency: int, duration: float,
+                warmup: float, page_size: int, seed: int) -> Dict:
+    send = request_factory(endpoint, api, page_size)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker(number: int):
+        nonlocal errors
+        rng = random.Random(seed + number)
+        session = sessions[number % len(sessions)]
+        while True:
+            sent = time.perf_counter()
+            if sent >= deadline:
+                return
+            try:
+                response = await send(session, rng)
+                status, failed = str(response.status_code), response.status_code >= 400
+            except httpx.HTTPError:
+                status, failed = "error", True
+            received = time.perf_counter()
+            if sent < measure_from:
+                continue
+            latencies.append(received - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+            errors += failed
+
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> Dict:
+    # Relative change against a previous report: positive means more throughput or more latency
+    def change(now: float, then: float) -> Optional[float]:
+        return round((now - then) / then * 100, 1) if then else None
+
+    changes = {}
+    for endpoint, result in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before or "latency_ms" not in before or "latency_ms" not in result:
+            continue
+        changes[endpoint] = {
+            "throughput_rps_pct": change(result["throughput_rps"], before["throughput_rps"]),
+            **{f"{key}_ms_pct": change(result["latency_ms"][key], before["latency_ms"][key])
+               for key in ("p50", "p95", "p99")},
+        }
+    return changes
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help=f"Comma separated subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--users", type=int, default=1_000, help="--users the database was seeded with")
+    parser.add_argument("--sessions", type=int, default=32, help="Distinct seeded users to log in as")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before each endpoint")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default=None, help="Free-form tag stored in the report, e.g. a release")
+    parser.add_argument("--baseline", default=None, help="Previous report to compare against")
+    parser.add_argument("--output", default=None, help="Write the report here as well as to stdout")
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    sessions = await open_sessions(args.base_url, args.api_prefix, args.sessions, args.users, rng, args.timeout)
+    try:
+        report = {
+            "label": args.label,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "python": platform.python_version(),
+            "config": {key: getattr(args, key) for key in ("users", "sessions", "concurrency", "duration",
+                                                            "warmup", "page_size", "seed")},
+            "endpoints": {},
+        }
+        for endpoint in endpoints:
+            # Skewed datasets leave some users without tasks; they have nothing to update
+            drivers = [session for session in sessions if session.task_ids] if endpoint == "update_task" else sessions
+            if not drivers:
+                report["endpoints"][endpoint] = {"skipped": "none of the sampled users own a task"}
+                continue
+            report["endpoints"][endpoint] = await drive(endpoint, drivers, args.api_prefix, args.concurrency,
+                                                        args.duration, args.warmup, args.page_size, args.seed)
+    finally:
+        await asyncio.gather(*(session.client.aclose() for session in sessions))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            report["compared_to"] = compare(report, json.load(file))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
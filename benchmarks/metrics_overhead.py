@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+for name, value in {"SECRET_KEY": "benchmark-secret", "POSTGRES_USER": "postgres",
+                    "POSTGRES_PASSWORD": "postgres", "POSTGRES_HOST": "localhost",
+                    "POSTGRES_PORT": "5432", "POSTGRES_DB": "benchmark"}.items():
+    os.environ.setdefault(name, value)
+
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.core.metrics import MetricsMiddleware, instrument_engine  # noqa: E402
+
+SCOPE = {"type": "http", "method": "GET", "path": "/api/v1/user/tasks",
+         "route": SimpleNamespace(path="/api/v1/user/tasks")}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def send(message):
+    pass
+
+
+async def measure_requests(app, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(SCOPE), None, send)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def measure_statements(iterations: int) -> float:
+    engine = create_async_engine("postgresql+asyncpg://benchmark@localhost/benchmark")
+    instrument_engine(engine, "primary")
+    dispatch = engine.sync_engine.dispatch
+    connection = SimpleNamespace(info={})
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        dispatch.before_cursor_execute(connection, None, "SELECT task.id FROM task", (), None, False)
+        dispatch.after_cursor_execute(connection, None, "SELECT task.id FROM task", (), None, False)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    bare = await measure_requests(endpoint, args.iterations)
+    instrumented = await measure_requests(MetricsMiddleware(endpoint), args.iterations)
+
+    print(json.dumps({
+        "iterations": args.iterations,
+        "request_overhead_us": round(instrumented - bare, 2),
+        "statement_overhead_us": round(measure_statements(args.iterations), 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+for name, value in {"SECRET_KEY": "benchmark-secret", "POSTGRES_USER": "postgres",
+                    "POSTGRES_PASSWORD": "postgres", "POSTGRES_HOST": "localhost",
+                    "POSTGRES_PORT": "5432", "POSTGRES_DB": "benchmark"}.items():
+    os.environ.setdefault(name, value)
+
+import asyncpg  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import hash_password  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+# Benchmark users get stable ids derived from their index, so tasks can reference them without a join and the
+# load driver can log in as `bench_<n>` without reading the database
+USER_ID = "md5('bench-user-' || {index})::uuid"
+
+INSERT_USERS = f"""
+INSERT INTO "user" (id, first_name, last_name, username, password)
+SELECT {USER_ID.format(index="g")}, 'Bench', 'User ' || g, 'bench_' || g, $3
+FROM generate_series($1::bigint, $2::bigint) AS g
+ON CONFLICT DO NOTHING
+"""
+
+# power(random(), skew) piles tasks onto the lowest user indexes as skew grows; skew=1 is uniform
+INSERT_TASKS = f"""
+INSERT INTO task (id, title, description, status, user_id)
+SELECT gen_random_uuid(),
+       'Task ' || g || ' ' || (ARRAY['report', 'invoice', 'deploy', 'review', 'meeting', 'backup'])[(1 + g % 6)::int],
+       CASE WHEN random() < 0.8 THEN repeat('Synthetic benchmark description. ', 1 + (g % 5)::int) END,
+       (ARRAY['NEW', 'IN_PROGRESS', 'COMPLETED']::taskstatus[])[1 + floor(random() * 3)::int],
+       {USER_ID.format(index="least($3::bigint, 1 + floor($3 * power(random(), $4::float8))::bigint)")}
+FROM generate_series($1::bigint, $2::bigint) AS g
+"""
+
+
+def dsn() -> str:
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def migrate() -> None:
+    engine = create_async_engine(settings.DATABASE_URL)
+    try:
+        await upgrade(engine)
+    finally:
+        await engine.dispose()
+
+
+async def insert_batches(conn, statement: str, total: int, batch_size: int, *args) -> None:
+    # One transaction per batch keeps the status counter triggers' transition tables and WAL bursts bounded
+    for start in range(1, total + 1, batch_size):
+        end = min(total, start + batch_size - 1)
+        await conn.execute(statement, start, end, *args)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="1 spreads tasks evenly over users; larger values concentrate them on a few users")
+    parser.add_argument("--batch-size", type=int, default=500_000)
+    parser.add_argument("--seed", type=float, default=0.42, help="Postgres setseed() value, in [-1, 1]")
+    parser.add_argument("--reset", action="store_true", help="Delete every user and task first")
+    args = parser.parse_args()
+
+    await migrate()
+    conn = await asyncpg.connect(dsn())
+    try:
+        started = time.perf_counter()
+        if args.reset:
+            await conn.execute('TRUNCATE "user", task, task_change_version, task_status_count')
+        await conn.execute("SELECT setseed($1)", args.seed)
+
+        # One bcrypt hash shared by every benchmark user; hashing per row would dominate the load time
+        await insert_batches(conn, INSERT_USERS, args.users, args.batch_size, hash_password(PASSWORD))
+        users_seconds = time.perf_counter() - started
+
+        await insert_batches(conn, INSERT_TASKS, args.tasks, args.batch_size, args.users, args.skew)
+        await conn.execute('ANALYZE "user"')
+        await conn.execute("ANALYZE task")
+        elapsed = time.perf_counter() - started
+    finally:
+        await conn.close()
+
+    print(json.dumps({
+        "users": args.users,
+        "tasks": args.tasks,
+        "skew": args.skew,
+        "seed": args.seed,
+        "users_seconds": round(users_seconds, 2),
+        "total_seconds": round(elapsed, 2),
+        "tasks_per_second": round(args.tasks / max(elapsed - users_seconds, 1e-9)),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
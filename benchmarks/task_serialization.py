@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+import uuid
+
+for name, value in {"SECRET_KEY": "benchmark-secret", "POSTGRES_USER": "postgres",
+                    "POSTGRES_PASSWORD": "postgres", "POSTGRES_HOST": "localhost",
+                    "POSTGRES_PORT": "5432", "POSTGRES_DB": "benchmark"}.items():
+    os.environ.setdefault(name, value)
+
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from app.models.enum import TaskStatus  # noqa: E402
+from app.models.task import Task  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.repository.task_repository import TaskRepository  # noqa: E402
+from app.schemas.pagination import PaginationResponse  # noqa: E402
+from app.schemas.task import (TaskResponse,  # noqa: E402
+                              normalized_task_page_serializer,
+                              task_page_serializer)
+
+
+def make_rows(page_size: int):
+    owner = uuid.uuid4()
+    return [(uuid.uuid4(), f"Task {i}", "Some description of the task", TaskStatus.IN_PROGRESS, owner, 1,
+             "Test", "User", "testuser") for i in range(page_size)]
+
+
+def make_orm_tasks(rows):
+    tasks = []
+    for id, title, description, status, user_id, version, first_name, last_name, username in rows:
+        user = User(id=user_id, first_name=first_name, last_name=last_name, username=username, password="x")
+        tasks.append(Task(id=id, title=title, description=description, status=status, user_id=user_id,
+                          version=version, user=user))
+    return tasks
+
+
+async def orm_path(rows, field):
+    # What each list request used to do: ORM instances -> PaginationResponse -> FastAPI response_model
+    tasks = make_orm_tasks(rows)
+    page = PaginationResponse(items=tasks, total=len(tasks), page=1, page_size=len(tasks), pages=1)
+    content = await serialize_response(field=field, response_content=page)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+async def row_path(rows, _field):
+    items = [TaskRepository._to_record(row) for row in rows]
+    return task_page_serializer.dump_json({"items": items, "total": len(items), "page": 1,
+                                           "page_size": len(items), "pages": 1, "next_cursor": None})
+
+
+async def normalized_path(rows, _field):
+    items = [TaskRepository._to_task_record(row) for row in rows]
+    users = {row[4]: {"first_name": row[6], "last_name": row[7], "username": row[8]} for row in rows}
+    return normalized_task_page_serializer.dump_json({"items": items, "users": users, "total": len(items), "page": 1,
+                                                      "page_size": len(items), "pages": 1, "next_cursor": None})
+
+
+async def measure(func, rows, field, iterations: int):
+    payload = await func(rows, field)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func(rows, field)
+    elapsed = (time.perf_counter() - started) / iterations * 1e6
+
+    tracemalloc.start()
+    await func(rows, field)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"us_per_page": round(elapsed, 1), "peak_bytes": peak, "payload_bytes": len(payload)}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = make_rows(args.page_size)
+    field = create_model_field(name="Response_get_tasks", type_=PaginationResponse[TaskResponse], mode="serialization")
+
+    before = await measure(orm_path, rows, field, args.iterations)
+    after = await measure(row_path, rows, field, args.iterations)
+    normalized = await measure(normalized_path, rows, field, args.iterations)
+
+    print(json.dumps({
+        "page_size": args.page_size,
+        "iterations": args.iterations,
+        "before": before,
+        "after": after,
+        "normalized": normalized,
+        "speedup": round(before["us_per_page"] / after["us_per_page"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -22,7 +22,7 @@ def client():
 
 @pytest.fixture
 def db():
-    return Database(db_url=settings.TEST_DATABASE_URL)
+    return Database(db_url=settings.TEST_DATABASE_URL, replica_urls=[settings.TEST_DATABASE_URL])
 
 
 @pytest.fixture
@@ -106,7 +106,7 @@ def mock_task_service():
 
     service.get_all.side_effect = mock_get_all
 
-    async def mock_get(task_id):
+    async def mock_get(task_id, if_none_match=None):
         if task_id == uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"):
             return {
                 "id": task_id,
@@ -151,7 +151,7 @@ def mock_task_service():
 
     service.get_user_task.side_effect = mock_get_user_task
 
-    async def mock_update_user_task(task_id, user_id, task):
+    async def mock_update_user_task(task_id, user_id, task, expected_version=None):
         if task_id == uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"):
             return {
                 "id": task_id,
@@ -171,7 +171,7 @@ def mock_task_service():
 
     service.update_user_task.side_effect = mock_update_user_task
 
-    async def mock_delete_user_task(task_id, user_id):
+    async def mock_delete_user_task(task_id, user_id, expected_version=None):
         expected_task_id = uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca")
         expected_user_id = uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca")
 
@@ -37,7 +37,7 @@ def test_get_task_by_id(client, mock_task_service, override_dependencies):
     assert data["title"] == "Test Task"
     assert data["status"] == "New"
 
-    mock_task_service.get.assert_called_once_with(uuid.UUID(task_id))
+    mock_task_service.get.assert_called_once_with(uuid.UUID(task_id), None)
 
 
 def test_get_task_by_non_existent_id(client, mock_task_service, override_dependencies):
@@ -49,4 +49,4 @@ def test_get_task_by_non_existent_id(client, mock_task_service, override_depende
     response = client.get(f"/api/v1/task?task_id={non_existent_id}")
     assert response.status_code == 404
     assert "not found" in response.json()["detail"]
-    mock_task_service.get.assert_called_once_with(uuid.UUID(non_existent_id))
+    mock_task_service.get.assert_called_once_with(uuid.UUID(non_existent_id), None)
@@ -109,7 +109,8 @@ def test_delete_task(client, mock_task_service, override_dependencies):
 
     mock_task_service.delete_user_task.assert_called_once_with(
         uuid.UUID(task_id),
-        uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca")
+        uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"),
+        None
     )
 
 
@@ -123,3 +124,109 @@ def test_delete_nonexistent_task(client, mock_task_service, override_dependencie
 
     assert response.status_code == 404
     assert "not found" in response.json()["detail"]
+
+
+def test_update_task_with_if_match(client, mock_task_service, override_dependencies):
+    task_id = "fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"
+
+    response = client.patch(f"/api/v1/user/task?task_id={task_id}", json={"title": "New"},
+                            headers={"If-Match": 'W/"3"'})
+
+    assert response.status_code == 200
+    assert mock_task_service.update_user_task.call_args[0][3] == 3
+
+
+def test_get_user_tasks_passes_if_none_match(client, mock_task_service, override_dependencies):
+    response = client.get("/api/v1/user/tasks", headers={"If-None-Match": '"abc", W/"def"'})
+
+    assert response.status_code == 200
+    assert mock_task_service.get_user_task.call_args[1]["if_none_match"] == frozenset(['"abc"', '"def"'])
+
+
+def test_update_task_with_stale_version(client, mock_task_service, override_dependencies):
+    task_id = "fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"
+    mock_task_service.update_user_task.side_effect = HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED,
+                                                                   detail="stale")
+
+    response = client.patch(f"/api/v1/user/task?task_id={task_id}", json={"title": "New"},
+                            headers={"If-Match": '"2"'})
+
+    assert response.status_code == 412
+
+
+def test_delete_task_with_malformed_if_match(client, mock_task_service, override_dependencies):
+    task_id = "fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"
+
+    response = client.delete(f"/api/v1/user/task?task_id={task_id}", headers={"If-Match": '"abc"'})
+
+    assert response.status_code == 400
+    mock_task_service.delete_user_task.assert_not_called()
+
+
+def test_create_tasks_batch(client, mock_task_service, override_dependencies):
+    created_ids = [uuid.uuid4(), uuid.uuid4()]
+    mock_task_service.create_many.return_value = [{"id": id, "status": "created"} for id in created_ids]
+
+    response = client.post("/api/v1/user/tasks/batch", json=[{"title": "First"}, {"title": "Second"}])
+
+    assert response.status_code == 201
+    assert [item["id"] for item in response.json()] == [str(id) for id in created_ids]
+
+    tasks = mock_task_service.create_many.call_args[0][0]
+    assert [task.title for task in tasks] == ["First", "Second"]
+    assert {task.user_id for task in tasks} == {uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca")}
+
+
+def test_create_tasks_batch_rejects_empty_list(client, mock_task_service, override_dependencies):
+    response = client.post("/api/v1/user/tasks/batch", json=[])
+
+    assert response.status_code == 422
+    mock_task_service.create_many.assert_not_called()
+
+
+def test_update_tasks_batch_deduplicates_ids(client, mock_task_service, override_dependencies):
+    task_id = uuid.uuid4()
+    mock_task_service.update_user_tasks.return_value = [{"id": task_id, "status": "updated"}]
+
+    response = client.patch("/api/v1/user/tasks/batch", json=[
+        {"id": str(task_id), "title": "Old"},
+        {"id": str(task_id), "status": "Completed"},
+    ])
+
+    assert response.status_code == 200
+    user_id, tasks = mock_task_service.update_user_tasks.call_args[0]
+    assert len(tasks) == 1
+    assert tasks[0].status == TaskStatus.COMPLETED
+
+
+def test_delete_tasks_batch(client, mock_task_service, override_dependencies):
+    deleted_id, missing_id = uuid.uuid4(), uuid.uuid4()
+    mock_task_service.delete_user_tasks.return_value = [
+        {"id": deleted_id, "status": "deleted"},
+        {"id": missing_id, "status": "not_found"},
+    ]
+
+    response = client.request("DELETE", "/api/v1/user/tasks/batch", json=[str(deleted_id), str(missing_id)])
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == ["deleted", "not_found"]
+    mock_task_service.delete_user_tasks.assert_called_once_with(
+        uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"), [deleted_id, missing_id])
+
+
+def test_get_user_tasks_normalized_shape(client, mock_task_service, override_dependencies):
+    response = client.get("/api/v1/user/tasks?shape=normalized")
+
+    assert response.status_code == 200
+    assert mock_task_service.get_user_task.call_args[1]["shape"] == "normalized"
+
+
+def test_get_tasks_summary(client, mock_task_service, override_dependencies):
+    mock_task_service.get_status_summary.return_value = {
+        "counts": {"New": 1, "In progress": 0, "Completed": 2}, "total": 3}
+
+    response = client.get("/api/v1/user/tasks/summary")
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+    mock_task_service.get_status_summary.assert_called_once_with(uuid.UUID("fa90ea32-1d7c-4ee8-9b68-07e6b4a813ca"))
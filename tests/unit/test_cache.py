@@ -0,0 +1,254 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.cache import SingleFlight, TTLCache
+from app.core.database import UnitOfWork, current_unit_of_work
+from app.core.metrics import RequestStats, request_stats
+from app.core.query_log import current_query_log, query_inspector
+from app.repository.user_repository import UserRepository
+from app.services import AuthService
+
+
+def make_user(user_id):
+    user = MagicMock()
+    user.id = user_id
+    user.username = "testuser"
+    user.first_name = "Test"
+    user.last_name = "Test"
+    return user
+
+
+def test_cache_hit_and_miss_counters():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    with patch("app.core.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.core.cache.time.monotonic", return_value=161.0):
+        assert cache.get("a") is None
+
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_principal_is_loaded_once():
+    user_id = uuid.uuid4()
+    repository = AsyncMock(spec=UserRepository)
+    repository.get.return_value = make_user(user_id)
+    service = AuthService(repository, user_cache=TTLCache(maxsize=10, ttl=60))
+
+    first = await service.get_principal(str(user_id))
+    second = await service.get_principal(user_id)
+
+    assert first is second
+    assert first.id == user_id
+    repository.get.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_user_update_invalidates_principal():
+    user_id = uuid.uuid4()
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(user_id, "principal")
+    repository = UserRepository(session_factory=MagicMock(), user_cache=cache)
+
+    with patch("app.repository.base_repository.BaseRepository.update", AsyncMock()):
+        await repository.update(user_id, MagicMock())
+
+    assert cache.get(user_id) is None
+
+
+@pytest.mark.asyncio
+async def test_user_update_in_a_request_session_invalidates_after_commit():
+    user_id = uuid.uuid4()
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(user_id, "principal")
+    repository = UserRepository(session_factory=MagicMock(), user_cache=cache)
+    unit_of_work = UnitOfWork(MagicMock())
+    unit_of_work.writes = True
+    unit_of_work.session = AsyncMock()
+
+    token = current_unit_of_work.set(unit_of_work)
+    try:
+        with patch("app.repository.base_repository.BaseRepository.update", AsyncMock()):
+            await repository.update(user_id, MagicMock())
+        assert cache.get(user_id) == "principal"
+    finally:
+        current_unit_of_work.reset(token)
+
+    await unit_of_work.complete(200)
+    assert cache.get(user_id) is None
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_concurrent_identical_calls():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def query(value):
+        calls.append(value)
+        await release.wait()
+        return value
+
+    pending = [asyncio.create_task(flight.do(key, lambda key=key: query(key))) for key in ("a", "a", "a", "b")]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*pending) == ["a", "a", "a", "b"]
+    assert calls == ["a", "b"]
+    assert flight.stats() == {"calls": 2, "shared": 2, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_failures_and_survives_a_cancelled_caller():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def query():
+        await release.wait()
+        raise ValueError("boom")
+
+    first = asyncio.create_task(flight.do("key", query))
+    second = asyncio.create_task(flight.do("key", query))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    with pytest.raises(ValueError, match="boom"):
+        await second
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_single_flight_forget_starts_a_fresh_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def query():
+        nonlocal calls
+        calls += 1
+        number = calls
+        await release.wait()
+        return number
+
+    before = asyncio.create_task(flight.do("key", query))
+    await asyncio.sleep(0)
+    flight.forget()
+    after = asyncio.create_task(flight.do("key", query))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await before == 1
+    assert await after == 2
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_are_coalesced_until_a_write_commits():
+    queries = 0
+    release = asyncio.Event()
+
+    @asynccontextmanager
+    async def read_session_factory():
+        nonlocal queries
+        queries += 1
+        await release.wait()
+        result = MagicMock()
+        result.scalars.return_value.one_or_none.return_value = "user"
+        yield MagicMock(execute=AsyncMock(return_value=result))
+
+    @asynccontextmanager
+    async def session_factory():
+        yield AsyncMock()
+
+    repository = UserRepository(session_factory=session_factory, read_session_factory=read_session_factory,
+                                single_flight=SingleFlight())
+
+    reads = [asyncio.create_task(repository.get_by_username("andersen")) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert queries == 1
+
+    async with repository.session_factory():
+        pass
+    reads.append(asyncio.create_task(repository.get_by_username("andersen")))
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.gather(*reads) == ["user"] * 4
+    # The read issued after the write committed may not join the one that started before it
+    assert queries == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_read_statements_count_towards_every_request():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def query():
+        # Stands in for the engine listeners, which record into whatever the running context holds
+        await release.wait()
+        request_stats.get().statements += 2
+        query_inspector.record(current_query_log.get(), "SELECT * FROM task WHERE id = 1", 0.0)
+        return "rows"
+
+    async def handle_request():
+        stats = RequestStats()
+        request_stats.set(stats)
+        with query_inspector.scope("GET /tasks") as log:
+            assert await flight.do("key", query) == "rows"
+        return stats.statements, log.counts
+
+    requests = [asyncio.create_task(handle_request()) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*requests) == [(2, {"SELECT * FROM task WHERE id = ?": 1})] * 2
+    assert flight.stats()["shared"] == 1
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_inside_a_unit_of_work_are_not_coalesced():
+    flight = AsyncMock(spec=SingleFlight)
+    result = MagicMock()
+    result.scalars.return_value.one_or_none.return_value = "user"
+
+    @asynccontextmanager
+    async def read_session_factory():
+        yield MagicMock(execute=AsyncMock(return_value=result))
+
+    repository = UserRepository(session_factory=read_session_factory, read_session_factory=read_session_factory,
+                                single_flight=flight)
+    token = current_unit_of_work.set(UnitOfWork(MagicMock()))
+    try:
+        assert await repository.get_by_username("andersen") == "user"
+    finally:
+        current_unit_of_work.reset(token)
+
+    flight.do.assert_not_called()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.change_feed import RESYNC, ChangeFeed
+from app.repository.task_repository import TaskRepository
+from app.services.task_service import TaskService
+
+
+class FakeConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.on_terminate = None
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.on_terminate = callback
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def notify(self, channel, payload):
+        self.listeners[channel](self, 1, channel, json.dumps(payload))
+
+    def drop(self):
+        self.closed = True
+        self.on_terminate(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def terminate(self):
+        self.closed = True
+
+
+def fake_feed(**kwargs):
+    connections = []
+
+    async def connect(dsn, timeout):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    return ChangeFeed("postgresql+asyncpg://u:p@db/app", "task_events", connect=connect, reconnect_seconds=0,
+                      **kwargs), connections
+
+
+@pytest.mark.asyncio
+async def test_notifications_are_routed_by_user():
+    feed, connections = fake_feed()
+    user_id, other_id = uuid.uuid4(), uuid.uuid4()
+
+    async with feed.subscribe(user_id) as queue:
+        assert feed.dsn == "postgresql://u:p@db/app"
+        assert feed.subscribers == 1
+        connections[0].notify("task_events", {"event": "created", "user_id": str(other_id), "version": 1})
+        connections[0].notify("task_events", {"event": "updated", "user_id": str(user_id), "version": 7})
+
+        assert queue.get_nowait() == {"event": "updated", "user_id": str(user_id), "version": 7}
+        assert queue.empty()
+
+    assert feed.subscribers == 0
+    await feed.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_told_to_resync():
+    feed, connections = fake_feed(queue_size=2)
+    user_id = uuid.uuid4()
+
+    async with feed.subscribe(user_id) as queue:
+        for version in range(3):
+            connections[0].notify("task_events", {"event": "updated", "user_id": str(user_id), "version": version})
+
+        assert queue.get_nowait() == RESYNC
+        assert queue.empty()
+
+    await feed.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_tells_subscribers_to_resync():
+    feed, connections = fake_feed()
+
+    async with feed.subscribe(uuid.uuid4()) as queue:
+        connections[0].drop()
+
+        assert await asyncio.wait_for(queue.get(), timeout=1) == RESYNC
+        assert len(connections) == 2
+
+    await feed.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_ready_then_events():
+    user_id = uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_change_version.return_value = 3
+    queue = asyncio.Queue()
+    queue.put_nowait({"event": "created", "user_id": str(user_id), "version": 4, "ids": ["a"]})
+    feed = MagicMock(spec=ChangeFeed)
+    feed.subscribe.return_value.__aenter__.return_value = queue
+    service = TaskService(repository, change_feed=feed, event_heartbeat_seconds=0.01)
+
+    response = await service.stream_user_events(user_id, last_event_id="2")
+    chunks = response.body_iterator
+    received = [await anext(chunks) for _ in range(4)]
+    await chunks.aclose()
+
+    assert response.media_type == "text/event-stream"
+    assert received[0].startswith("retry: ")
+    assert received[1] == 'id: 3\nevent: resync\ndata: {"version":3}\n\n'
+    assert received[2].startswith("id: 4\nevent: created\ndata: ")
+    assert received[3] == ": keepalive\n\n"
+    repository.get_change_version.assert_awaited_once_with(user_id, primary=True)
+    feed.subscribe.return_value.__aexit__.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stream_is_not_found_when_disabled():
+    with pytest.raises(HTTPException) as error:
+        await TaskService(AsyncMock(spec=TaskRepository)).stream_user_events(uuid.uuid4())
+    assert error.value.status_code == 404
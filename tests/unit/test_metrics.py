@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.metrics import (MetricsMiddleware, MetricsRegistry, RequestStats,
+                              db_statement_duration,
+                              http_request_db_statements,
+                              http_request_duration, instrument_engine,
+                              request_stats)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+
+    histogram.observe(0.05, 'say "hi"')
+    histogram.observe(0.5, 'say "hi"')
+    histogram.observe(5, 'say "hi"')
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="say \\"hi\\""} 3' in lines
+    assert 'latency_seconds_sum{route="say \\"hi\\""} 5.55' in lines
+
+
+def test_gauges_are_read_at_render_time():
+    registry = MetricsRegistry()
+    state = {"pending": 1}
+    registry.gauge("pending", "Pending work", (), lambda: [((), state["pending"])])
+
+    state["pending"] = 4
+
+    assert "pending 4" in registry.render().splitlines()
+
+
+def test_engine_events_count_statements_for_the_request():
+    engine = create_async_engine("postgresql+asyncpg://u:p@localhost/d")
+    instrument_engine(engine, "test")
+    connection = SimpleNamespace(info={})
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    before = sum(db_statement_duration._series.get(("test", "SELECT"), [[0]])[0])
+
+    try:
+        for _ in range(2):
+            engine.sync_engine.dispatch.before_cursor_execute(connection, None, "SELECT 1", (), None, False)
+            engine.sync_engine.dispatch.after_cursor_execute(connection, None, "SELECT 1", (), None, False)
+    finally:
+        request_stats.reset(token)
+
+    assert stats.statements == 2
+    assert stats.db_seconds > 0
+    assert sum(db_statement_duration._series[("test", "SELECT")][0]) == before + 2
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        request_stats.get().statements += 3
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    series = ("GET", "/items/{item_id}", "200")
+    before = sum(http_request_duration._series.get(series, [[0]])[0])
+
+    client.get("/items/1")
+    client.get("/items/2")
+
+    assert sum(http_request_duration._series[series][0]) == before + 2
+    assert http_request_db_statements._series[("GET", "/items/{item_id}")][1] >= 6
+
+
+def test_metrics_endpoint_exposes_text_format(client):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'db_pool_connections{role="primary",index="0",state="checked_out"}' in response.text
@@ -0,0 +1,47 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.migrations import create_index_concurrently, discover
+from app.models.task import Task
+
+
+def test_migrations_are_ordered_and_unique():
+    versions = [migration.version for migration in discover()]
+
+    assert versions == sorted(set(versions))
+    assert versions[0] == 1
+
+
+def test_index_migration_runs_outside_a_transaction():
+    migration = next(migration for migration in discover() if migration.name == "task_indexes")
+
+    assert migration.transactional is False
+    assert set(migration.module.INDEXES) <= {index.name for index in Task.__table__.indexes}
+
+
+@pytest.mark.asyncio
+async def test_invalid_index_is_rebuilt():
+    conn = MagicMock()
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = False
+    conn.execute = AsyncMock(return_value=result)
+    conn.exec_driver_sql = AsyncMock()
+
+    await create_index_concurrently(conn, "ix_task_status_id", "task (status, id)")
+
+    statements = [call.args[0] for call in conn.exec_driver_sql.call_args_list]
+    assert statements == [
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_task_status_id",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_task_status_id ON task (status, id)",
+    ]
+
+
+def test_foreign_key_is_validated_separately():
+    migration = next(migration for migration in discover() if migration.name == "initial")
+    statements = [" ".join(statement.split()) for statement in migration.module.STATEMENTS]
+    added = next(index for index, statement in enumerate(statements) if "ADD CONSTRAINT task_user_id_fkey" in statement)
+
+    assert migration.transactional is False
+    assert "NOT VALID" in statements[added]
+    assert statements[added + 1] == "ALTER TABLE task VALIDATE CONSTRAINT task_user_id_fkey"
@@ -0,0 +1,116 @@
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.core.exceptions import InvalidCursorException
+from app.repository.task_repository import TaskRepository
+from app.schemas.pagination import (CountMode, PaginationParams, decode_cursor,
+                                    encode_cursor)
+from app.schemas.task import TaskPage
+from app.services.task_service import TaskService
+
+
+def test_cursor_round_trip():
+    task_id = uuid.uuid4()
+
+    cursor = encode_cursor(task_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [str(task_id)]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor()[:-1], "e30", "WzFd", "W251bGxd"])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_page_is_ordered_and_seeks_past_cursor():
+    repository = TaskRepository(session_factory=MagicMock())
+    last_id = uuid.uuid4()
+
+    stmt = repository._paginate(select(repository.model_class),
+                                PaginationParams(page=5, page_size=10, cursor=encode_cursor(last_id)))
+    sql = str(stmt)
+
+    assert "ORDER BY task.id" in sql
+    assert "task.id >" in sql
+    assert "OFFSET" not in sql
+
+
+@pytest.mark.asyncio
+async def test_service_returns_next_cursor():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_versioned_user_task.return_value = (1, TaskPage([], 21, "next"))
+    service = TaskService(repository)
+
+    response = await service.get_user_task(uuid.uuid4(), pagination=PaginationParams())
+    page = json.loads(response.body)
+
+    assert page["next_cursor"] == "next"
+    assert page["total"] == 21
+    assert page["pages"] == 3
+    repository.count.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_service_skips_total_when_not_counted():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_all.return_value = TaskPage([], None, None)
+    service = TaskService(repository)
+
+    response = await service.get_all(pagination=PaginationParams(count=CountMode.NONE))
+    page = json.loads(response.body)
+
+    assert page["total"] is None
+    assert page["pages"] is None
+
+
+def test_user_page_is_filtered_by_owner():
+    repository = TaskRepository(session_factory=MagicMock())
+    user_id = uuid.uuid4()
+
+    stmt = select(repository.model_class).where(*repository._conditions(user_id, status=None))
+
+    assert "task.user_id =" in str(stmt)
+
+
+@pytest.mark.asyncio
+async def test_service_rejects_invalid_cursor():
+    repository = TaskRepository(session_factory=MagicMock())
+    service = TaskService(repository)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.get_all(pagination=PaginationParams(cursor="bogus"))
+
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rows, statements, total", [(11, 2, 42), (3, 1, 13)])
+async def test_exact_total_is_a_separate_count_unless_the_page_is_the_last(rows, statements, total):
+    repository = TaskRepository(session_factory=MagicMock())
+    page = MagicMock()
+    page.all.return_value = [(uuid.uuid4(), "Task", None, "New", uuid.uuid4(), 1, "Test", None, "test")] * rows
+    count = MagicMock()
+    count.scalar.return_value = 42
+    session = MagicMock(execute=AsyncMock(side_effect=[page, count]))
+
+    result = await repository._fetch_page(session, [], PaginationParams(page=2, page_size=10))
+
+    executed = [str(call.args[0]) for call in session.execute.call_args_list]
+    assert "OVER" not in executed[0]
+    assert len(executed) == statements
+    assert result.total == total
+
+
+@pytest.mark.parametrize("cursor", ["WzFd", "W251bGxd"])
+def test_cursor_with_non_string_values_is_invalid(cursor):
+    repository = TaskRepository(session_factory=MagicMock())
+
+    with pytest.raises(InvalidCursorException):
+        repository._paginate(select(repository.model_class), PaginationParams(cursor=cursor))
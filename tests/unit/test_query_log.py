@@ -0,0 +1,76 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.query_log import (QueryInspector, current_query_log, fingerprint,
+                                inspect_engine, query_inspector)
+
+
+@pytest.fixture
+def inspector():
+    return QueryInspector(enabled=True, slow_query_seconds=0.5, n_plus_one_threshold=3)
+
+
+def test_fingerprint_normalizes_literals_parameters_and_lists():
+    assert fingerprint("SELECT * FROM task WHERE id = $1 AND title = 'a''b'") == \
+        "SELECT * FROM task WHERE id = ? AND title = ?"
+    assert fingerprint("SELECT * FROM task\n  WHERE id IN ($1::UUID, $2::UUID, $3::UUID) LIMIT 10") == \
+        fingerprint("SELECT * FROM task WHERE id IN ($7::UUID) LIMIT 20") == \
+        "SELECT * FROM task WHERE id IN (...) LIMIT ?"
+    assert fingerprint("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4)") == "INSERT INTO t (a, b) VALUES (...)"
+    assert fingerprint("SELECT task_1.id FROM task AS task_1") == "SELECT task_1.id FROM task AS task_1"
+
+
+def test_scope_is_shared_by_nested_sessions_and_skipped_when_disabled(inspector):
+    with inspector.scope("GET /tasks") as outer:
+        with inspector.scope("session") as inner:
+            assert inner is outer
+    assert current_query_log.get() is None
+
+    inspector.configure(enabled=False)
+    with inspector.scope("GET /tasks") as log:
+        assert log is None
+
+
+def test_slow_statements_are_logged(inspector, caplog):
+    with inspector.scope("GET /tasks") as log, caplog.at_level(logging.WARNING):
+        inspector.record(log, "SELECT * FROM task WHERE id = $1", 0.01)
+        inspector.record(log, "SELECT * FROM task WHERE id = $1", 0.75)
+
+    assert log.statements == [("SELECT * FROM task WHERE id = ?", 0.01), ("SELECT * FROM task WHERE id = ?", 0.75)]
+    slow = [record.message for record in caplog.records if record.message.startswith("Slow query")]
+    assert slow == ["Slow query (750.0 ms) in GET /tasks: SELECT * FROM task WHERE id = ?"]
+
+
+def test_repeated_fingerprint_is_flagged_once_per_scope(inspector, caplog):
+    with inspector.scope("GET /tasks") as log, caplog.at_level(logging.WARNING):
+        for i in range(6):
+            inspector.record(log, f"SELECT * FROM users WHERE id = {i}", 0.001)
+
+    assert log.counts == {"SELECT * FROM users WHERE id = ?": 6}
+    flagged = [record.message for record in caplog.records if "N+1" in record.message]
+    assert flagged == ["Possible N+1 in GET /tasks: statement ran more than 3 times: SELECT * FROM users WHERE id = ?"]
+
+
+def test_engine_events_record_into_the_active_log():
+    engine = create_async_engine("postgresql+asyncpg://u:p@localhost/d")
+    inspect_engine(engine)
+    connection = SimpleNamespace(info={})
+
+    def execute(statement):
+        engine.sync_engine.dispatch.before_cursor_execute(connection, None, statement, (), None, False)
+        engine.sync_engine.dispatch.after_cursor_execute(connection, None, statement, (), None, False)
+
+    enabled = query_inspector.enabled
+    query_inspector.configure(enabled=True)
+    try:
+        execute("SELECT 1")
+        with query_inspector.scope("job") as log:
+            execute("SELECT * FROM task WHERE id = $1")
+    finally:
+        query_inspector.configure(enabled=enabled)
+
+    assert [sql for sql, _ in log.statements] == ["SELECT * FROM task WHERE id = ?"]
+    assert connection.info == {}
@@ -0,0 +1,141 @@
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.rate_limit import (MemoryRateLimitBackend, RateLimitMiddleware,
+                                 RateLimitRule, parse_limit)
+from app.core.security import create_tokens
+from app.repository.user_repository import UserRepository
+from app.schemas.auth import LoginRequest
+from app.services import AuthService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_limit():
+    assert parse_limit("5/60") == (5, 5 / 60)
+    with pytest.raises(ValueError):
+        parse_limit("0/60")
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    backend = MemoryRateLimitBackend(clock=clock)
+    limit = parse_limit("2/10")
+
+    assert await backend.acquire("k", limit) == 0
+    assert await backend.acquire("k", limit) == 0
+    assert await backend.acquire("k", limit) == pytest.approx(5)
+
+    clock.now += 5
+    assert await backend.acquire("k", limit) == 0
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_bucket_is_evicted():
+    backend = MemoryRateLimitBackend(max_keys=2, clock=FakeClock())
+    limit = parse_limit("1/60")
+
+    for key in ("a", "b", "c"):
+        await backend.acquire(key, limit)
+
+    assert await backend.acquire("a", limit) == 0
+    assert await backend.acquire("c", limit) > 0
+
+
+def limited_client(backend):
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    async def login():
+        return {"ok": True}
+
+    @app.get("/tasks")
+    async def tasks():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, backend=backend,
+                       rules=[RateLimitRule("login", parse_limit("1/60"), "POST", "/auth/login")],
+                       default=parse_limit("2/60"))
+    return TestClient(app)
+
+
+def test_login_budget_is_separate_from_default():
+    client = limited_client(MemoryRateLimitBackend())
+
+    assert client.post("/auth/login").status_code == 200
+    response = client.post("/auth/login")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "60"
+
+    assert client.get("/tasks").status_code == 200
+
+
+def test_default_budget_follows_the_user_token():
+    client = limited_client(MemoryRateLimitBackend())
+    token, _ = create_tokens(uuid.uuid4())
+
+    assert client.get("/tasks").status_code == 200
+    assert client.get("/tasks").status_code == 200
+    assert client.get("/tasks").status_code == 429
+    client.cookies.set("access_token", token)
+    assert client.get("/tasks").status_code == 200
+
+
+@pytest.mark.parametrize("trusted_proxies, client_ip", [(1, "203.0.113.7"), (2, "198.51.100.4")])
+def test_forwarded_for_is_read_from_the_trusted_end(trusted_proxies, client_ip):
+    middleware = RateLimitMiddleware(None, MemoryRateLimitBackend(), [], parse_limit("1/60"),
+                                     trust_forwarded_for=True, trusted_proxies=trusted_proxies)
+    # The client made up the first two entries; the last ones were appended by the proxies
+    scope = {"client": ("10.0.0.2", 1234),
+             "headers": [(b"x-forwarded-for", b"1.2.3.4, 5.6.7.8, 198.51.100.4"),
+                         (b"x-forwarded-for", b"203.0.113.7")]}
+
+    assert middleware._client_ip(scope) == client_ip
+    assert middleware._client_ip({"client": ("10.0.0.2", 1234), "headers": []}) == "10.0.0.2"
+
+
+def test_spoofed_forwarded_for_does_not_reset_the_login_budget():
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    async def login():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, backend=MemoryRateLimitBackend(),
+                       rules=[RateLimitRule("login", parse_limit("1/60"), "POST", "/auth/login")],
+                       default=parse_limit("10/60"), trust_forwarded_for=True)
+    client = TestClient(app)
+
+    statuses = [client.post("/auth/login", headers={"X-Forwarded-For": f"10.9.9.{attempt}, 203.0.113.7"}).status_code
+                for attempt in range(3)]
+
+    assert statuses == [200, 429, 429]
+
+
+@pytest.mark.asyncio
+async def test_login_is_limited_per_username_before_hashing():
+    repository = AsyncMock(spec=UserRepository)
+    repository.get_by_username.return_value = None
+    service = AuthService(repository, rate_limiter=MemoryRateLimitBackend(), username_limit=parse_limit("1/60"))
+    login = LoginRequest(username="Victim", password="guess-1")
+
+    with pytest.raises(HTTPException) as exc:
+        await service.login(login, None)
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc:
+        await service.login(LoginRequest(username="victim", password="guess-1"), None)
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "60"
+    repository.get_by_username.assert_called_once()
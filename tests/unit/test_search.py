@@ -0,0 +1,91 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import InvalidCursorException
+from app.models.task import Task
+from app.repository.task_repository import TaskRepository
+from app.schemas.pagination import (CountMode, PaginationParams, decode_cursor,
+                                    encode_cursor)
+from app.schemas.task import TaskStatus
+
+
+def compile_sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_search_filters_on_indexed_vector():
+    repository = TaskRepository(session_factory=MagicMock())
+
+    sql = compile_sql(select(Task.id).where(*repository._conditions(uuid.uuid4(), q="groceries -milk")))
+
+    assert "task.search_vector @@ websearch_to_tsquery(" in sql
+    assert "ix_task_search_vector" in {index.name for index in Task.__table__.indexes}
+
+
+def test_ranked_keyset_seeks_past_rank_and_id():
+    repository = TaskRepository(session_factory=MagicMock())
+    rank = repository._rank(q="groceries")
+
+    stmt = repository._paginate(select(Task.id), PaginationParams(cursor=encode_cursor(0.5, uuid.uuid4())), rank)
+    sql = compile_sql(stmt)
+
+    assert "ORDER BY ts_rank(task.search_vector" in sql
+    assert "DESC, task.id" in sql
+    assert "OFFSET" not in sql
+
+
+def test_id_cursor_is_rejected_for_ranked_search():
+    repository = TaskRepository(session_factory=MagicMock())
+
+    with pytest.raises(InvalidCursorException):
+        repository._paginate(select(Task.id), PaginationParams(cursor=encode_cursor(uuid.uuid4())),
+                             repository._rank(q="groceries"))
+
+
+def test_search_vector_is_not_loaded_with_tasks():
+    assert "search_vector" not in str(select(Task))
+
+
+@pytest.mark.asyncio
+async def test_ranked_page_returns_rank_cursor():
+    user_id = uuid.uuid4()
+    rows = []
+    for rank in (0.9, 0.6, 0.3):
+        row = MagicMock()
+        row.__getitem__.side_effect = (uuid.uuid4(), "Buy groceries", None, TaskStatus.NEW, user_id, 1,
+                                  "Test", None, "testuser").__getitem__
+        row.rank = rank
+        rows.append(row)
+
+    result = MagicMock()
+    result.all.return_value = rows
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=result)
+    context = MagicMock()
+    context.__aenter__.return_value = session
+    repository = TaskRepository(session_factory=MagicMock(), read_session_factory=MagicMock(return_value=context))
+
+    page = await repository.get_user_task(user_id, PaginationParams(page_size=2, count=CountMode.NONE),
+                                          q="groceries")
+
+    assert len(page.items) == 2
+    assert decode_cursor(page.next_cursor) == ["0.6", str(page.items[-1]["id"])]
+
+
+@pytest.mark.asyncio
+async def test_estimated_count_with_search_keeps_bound_parameters():
+    plan = MagicMock()
+    plan.scalar.return_value = [{"Plan": {"Plan Rows": 42}}]
+    session = MagicMock(execute=AsyncMock(return_value=plan))
+    repository = TaskRepository(session_factory=MagicMock())
+
+    conditions = repository._conditions(uuid.uuid4(), status=TaskStatus.NEW, q="groceries")
+    assert await repository._estimate_count(session, conditions) == 42
+
+    sql = str(session.execute.call_args[0][0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT task.id")
+    assert "websearch_to_tsquery($3::REGCONFIG, $4::VARCHAR)" in sql
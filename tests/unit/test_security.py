@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from jose import jwt
+
+from app.core.exceptions import PasswordHasherBusyException
+from app.core.security import (PasswordHasher, create_token, create_tokens,
+                               decode_token, hash_password, token_cache,
+                               verify_password)
+
+
+@pytest.mark.asyncio
+async def test_hasher_runs_off_the_event_loop():
+    hasher = PasswordHasher(max_workers=1, max_pending=4)
+    threads = []
+
+    def fake_hash(password):
+        threads.append(threading.current_thread())
+        return f"hashed:{password}"
+
+    with patch("app.core.security.hash_password", fake_hash):
+        assert await hasher.hash("secret") == "hashed:secret"
+
+    assert threads[0] is not threading.main_thread()
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    def slow_verify(plain_password, hashed_password):
+        release.wait(5)
+        return True
+
+    with patch("app.core.security.verify_password", slow_verify):
+        first = asyncio.create_task(hasher.verify("a", "b"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(PasswordHasherBusyException):
+            await hasher.verify("a", "b")
+
+        release.set()
+        assert await first is True
+
+    assert hasher.pending == 0
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hasher_round_trip_with_bcrypt():
+    hasher = PasswordHasher(max_workers=2, max_pending=4)
+
+    hashed = await hasher.hash("password123")
+
+    assert await hasher.verify("password123", hashed)
+    assert verify_password("password123", hashed)
+    assert not verify_password("wrong", hash_password("password123"))
+    hasher.shutdown()
+
+
+def test_decode_token_verifies_signature_once():
+    token_cache.clear()
+    access_token, _ = create_tokens(uuid.uuid4())
+
+    with patch("app.core.security.jwt.decode", wraps=jwt.decode) as mock_decode:
+        first = decode_token(access_token)
+        second = decode_token(access_token)
+
+    assert first == second
+    mock_decode.assert_called_once()
+
+
+def test_decode_token_does_not_cache_invalid_tokens():
+    token_cache.clear()
+
+    assert decode_token("not-a-token") is None
+    assert len(token_cache) == 0
+
+
+def test_decode_token_cache_entry_expires_with_token():
+    token_cache.clear()
+    token = create_token({"sub": "user"}, expires_delta=timedelta(seconds=30))
+    decode_token(token)
+
+    with patch("app.core.cache.time.monotonic", return_value=time.monotonic() + 31):
+        assert token_cache.get(hashlib.sha256(token.encode()).digest()) is None
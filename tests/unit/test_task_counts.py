@@ -0,0 +1,63 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.migrations import discover
+from app.repository.task_repository import TaskRepository
+from app.schemas.task import TaskStatus, TaskStatusSummary
+from app.services.task_service import TaskService
+
+
+def session_factory_for(session):
+    context = MagicMock()
+    context.__aenter__.return_value = session
+    return MagicMock(return_value=context)
+
+
+@pytest.mark.asyncio
+async def test_missing_statuses_count_as_zero():
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=[(TaskStatus.COMPLETED, 4)])
+    repository = TaskRepository(session_factory=MagicMock(), read_session_factory=session_factory_for(session))
+
+    counts = await repository.get_status_counts(uuid.uuid4())
+
+    assert counts == {TaskStatus.NEW: 0, TaskStatus.IN_PROGRESS: 0, TaskStatus.COMPLETED: 4}
+    assert "FROM task_status_count" in str(session.execute.call_args[0][0])
+
+
+@pytest.mark.asyncio
+async def test_rebuild_locks_writers_and_recounts_one_user():
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=MagicMock(rowcount=2))
+    repository = TaskRepository(session_factory=session_factory_for(session))
+
+    assert await repository.rebuild_status_counts(uuid.uuid4()) == 2
+
+    lock, stale, counts = (str(call.args[0]) for call in session.execute.call_args_list)
+    assert lock == "LOCK TABLE task IN SHARE MODE"
+    assert stale.startswith("DELETE FROM task_status_count WHERE task_status_count.user_id")
+    assert counts.startswith("INSERT INTO task_status_count (user_id, status, count) SELECT")
+    assert "GROUP BY task.user_id, task.status" in counts
+
+
+def test_counter_triggers_cover_every_write():
+    migration = next(migration for migration in discover() if migration.name == "task_status_counts")
+    sql = " ".join(migration.module.STATEMENTS)
+
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        assert f"AFTER {operation} ON task" in sql
+    assert sql.count("FOR EACH STATEMENT") == 3
+
+
+@pytest.mark.asyncio
+async def test_summary_totals_counts():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_status_counts.return_value = {TaskStatus.NEW: 2, TaskStatus.IN_PROGRESS: 1,
+                                                 TaskStatus.COMPLETED: 3}
+
+    summary = await TaskService(repository).get_status_summary(uuid.uuid4())
+
+    assert summary == TaskStatusSummary(counts=repository.get_status_counts.return_value, total=6)
+    assert summary.model_dump(mode="json")["counts"] == {"New": 2, "In progress": 1, "Completed": 3}
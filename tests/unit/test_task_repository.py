@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.core.database import Database
+from app.models.task import Task, TaskChangeVersion
+from app.models.user import User
+from app.repository.task_repository import TaskRepository
+from app.schemas.task import TaskBatchUpdate, TaskStatus
+
+
+@pytest_asyncio.fixture
+async def test_database():
+    database = Database(db_url=settings.TEST_DATABASE_URL)
+    try:
+        await database.init_db()
+    except (OSError, DBAPIError) as e:
+        await database.engine.dispose()
+        pytest.skip(f"Test database unavailable: {e}")
+
+    user_id = uuid.uuid4()
+    async with database.session() as session:
+        await session.execute(insert(User).values(id=user_id, first_name="Test", password="x"))
+    try:
+        yield database, user_id
+    finally:
+        async with database.session() as session:
+            await session.execute(delete(User).where(User.id == user_id))
+        await database.engine.dispose()
+
+
+async def insert_tasks(database, user_id, count):
+    ids = [uuid.uuid4() for _ in range(count)]
+    async with database.session() as session:
+        await session.execute(insert(Task).values([{"id": id, "title": f"Task {index}", "user_id": user_id}
+                                                   for index, id in enumerate(ids)]))
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_batch_update_writes_only_the_users_tasks(test_database):
+    database, user_id = test_database
+    repository = TaskRepository(session_factory=database.session, read_session_factory=database.read_session)
+    first, second = await insert_tasks(database, user_id, 2)
+    missing = uuid.uuid4()
+
+    changed = await repository.update_user_tasks(user_id, [
+        TaskBatchUpdate(id=first, title="Renamed"),
+        TaskBatchUpdate(id=second, status=TaskStatus.COMPLETED),
+        TaskBatchUpdate(id=missing, title="Nobody"),
+    ])
+
+    assert sorted(changed) == sorted([first, second])
+    async with database.read_session() as session:
+        rows = {row.id: row for row in (await session.execute(select(Task).where(Task.user_id == user_id))).scalars()}
+        version = await session.scalar(select(TaskChangeVersion.version).where(TaskChangeVersion.user_id == user_id))
+    assert (rows[first].title, rows[first].status, rows[first].version) == ("Renamed", TaskStatus.NEW, 2)
+    assert (rows[second].title, rows[second].status, rows[second].version) == ("Task 1", TaskStatus.COMPLETED, 2)
+    assert version == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_delete_removes_only_the_users_tasks(test_database):
+    database, user_id = test_database
+    repository = TaskRepository(session_factory=database.session, read_session_factory=database.read_session)
+    first, second = await insert_tasks(database, user_id, 2)
+
+    assert await repository.delete_user_tasks(user_id, [first, uuid.uuid4()]) == [first]
+    assert await repository.delete_user_tasks(uuid.uuid4(), [second]) == []
+
+    async with database.read_session() as session:
+        remaining = (await session.execute(select(Task.id).where(Task.user_id == user_id))).scalars().all()
+    assert remaining == [second]
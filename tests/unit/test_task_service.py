@@ -0,0 +1,442 @@
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.exceptions import VersionConflictException
+from app.repository.task_repository import TaskRepository
+from app.schemas.pagination import (CountMode, PaginationParams,
+                                    PaginationResponse)
+from app.schemas.task import (BatchItemStatus, ResponseShape, TaskBatchUpdate,
+                              TaskCreate, TaskFileFormat, TaskPage,
+                              TaskResponse, TaskStatus, TaskUpdateInDB)
+from app.services.task_service import TaskService
+
+
+@pytest.mark.asyncio
+async def test_batch_update_reports_each_item():
+    user_id, updated_id, missing_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    repository.update_user_tasks.return_value = [updated_id]
+    service = TaskService(repository)
+
+    results = await service.update_user_tasks(user_id, [TaskBatchUpdate(id=updated_id, title="New"),
+                                                        TaskBatchUpdate(id=missing_id, title="New")])
+
+    assert [(result.id, result.status) for result in results] == [
+        (updated_id, BatchItemStatus.UPDATED),
+        (missing_id, BatchItemStatus.NOT_FOUND),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_delete_reports_each_item():
+    user_id, deleted_id, missing_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    repository.delete_user_tasks.return_value = [deleted_id]
+    service = TaskService(repository)
+
+    results = await service.delete_user_tasks(user_id, [deleted_id, missing_id])
+
+    assert [result.status for result in results] == [BatchItemStatus.DELETED, BatchItemStatus.NOT_FOUND]
+
+
+def session_factory_returning(*results):
+    session = MagicMock()
+    session.execute = AsyncMock(side_effect=list(results))
+    context = MagicMock()
+    context.__aenter__.return_value = session
+    return MagicMock(return_value=context), session
+
+
+@pytest.mark.asyncio
+async def test_update_is_a_single_versioned_statement():
+    result = MagicMock()
+    result.scalars.return_value.one_or_none.return_value = "task"
+    session_factory, session = session_factory_returning(result, MagicMock())
+    repository = TaskRepository(session_factory=session_factory)
+
+    assert await repository.update_user_task(uuid.uuid4(), uuid.uuid4(), TaskUpdateInDB(title="New"), 4) == "task"
+
+    sql, touch_sql = (str(call.args[0]) for call in session.execute.call_args_list)
+    assert sql.startswith("UPDATE task SET")
+    assert "version=(task.version +" in sql
+    assert "task.version = :version_2" in sql
+    assert "FOR UPDATE" not in sql
+    assert touch_sql.startswith("INSERT INTO task_change_version")
+    assert "ON CONFLICT (user_id) DO UPDATE" in touch_sql
+    assert "pg_notify" not in touch_sql
+
+
+@pytest.mark.asyncio
+async def test_change_version_bump_notifies_when_events_are_on():
+    result = MagicMock()
+    result.scalars.return_value.one_or_none.return_value = "task"
+    session_factory, session = session_factory_returning(result, MagicMock())
+    repository = TaskRepository(session_factory=session_factory, notify=True)
+
+    await repository.update_user_task(uuid.uuid4(), uuid.uuid4(), TaskUpdateInDB(title="New"))
+
+    touch_sql = str(session.execute.call_args_list[1].args[0])
+    assert touch_sql.startswith("WITH touched AS")
+    assert "INSERT INTO task_change_version" in touch_sql
+    assert "pg_notify" in touch_sql
+
+
+@pytest.mark.asyncio
+async def test_empty_update_does_not_bump_change_version():
+    result = MagicMock()
+    result.scalars.return_value.one_or_none.return_value = "task"
+    session_factory, session = session_factory_returning(result)
+    repository = TaskRepository(session_factory=session_factory)
+
+    await repository.update_user_task(uuid.uuid4(), uuid.uuid4(), TaskUpdateInDB())
+
+    session.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_update_with_stale_version_raises_conflict():
+    missing, existing = MagicMock(), MagicMock()
+    missing.scalars.return_value.one_or_none.return_value = None
+    existing.scalar_one_or_none.return_value = uuid.uuid4()
+    session_factory, session = session_factory_returning(missing, existing)
+    repository = TaskRepository(session_factory=session_factory)
+
+    with pytest.raises(VersionConflictException):
+        await repository.update_user_task(uuid.uuid4(), uuid.uuid4(), TaskUpdateInDB(title="New"), 4)
+
+
+@pytest.mark.asyncio
+async def test_stale_version_maps_to_precondition_failed():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.update_user_task.side_effect = VersionConflictException("Task", uuid.uuid4(), 2)
+    service = TaskService(repository)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.update_user_task(uuid.uuid4(), uuid.uuid4(), TaskUpdateInDB(title="New"), 2)
+
+    assert exc.value.status_code == 412
+
+
+def make_record(task_id=None, user_id=None):
+    return {
+        "id": task_id or uuid.uuid4(),
+        "title": "Task",
+        "description": None,
+        "status": TaskStatus.IN_PROGRESS,
+        "user_id": user_id or uuid.uuid4(),
+        "version": 2,
+        "user": {"first_name": "Test", "last_name": None, "username": "testuser"},
+    }
+
+
+@pytest.mark.asyncio
+async def test_page_is_serialized_in_response_model_shape():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_all.return_value = TaskPage([make_record(), make_record()], 2, None)
+    service = TaskService(repository)
+
+    response = await service.get_all(pagination=PaginationParams())
+
+    assert response.media_type == "application/json"
+    page = PaginationResponse[TaskResponse].model_validate_json(response.body)
+    assert page.total == 2
+    assert page.items[0].status == TaskStatus.IN_PROGRESS
+    assert page.items[0].user.username == "testuser"
+
+
+@pytest.mark.asyncio
+async def test_single_task_is_serialized_from_record():
+    task_id = uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get.return_value = make_record(task_id)
+    service = TaskService(repository)
+
+    response = await service.get(task_id)
+
+    assert json.loads(response.body)["id"] == str(task_id)
+
+
+@pytest.mark.asyncio
+async def test_normalized_page_carries_users_once():
+    user_id = uuid.uuid4()
+    items = []
+    for _ in range(3):
+        record = make_record(user_id=user_id)
+        del record["user"]
+        items.append(record)
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_versioned_user_task.return_value = (1, TaskPage(items, 3, None, {
+        user_id: {"first_name": "Test", "last_name": None, "username": "testuser"}}))
+    service = TaskService(repository)
+
+    response = await service.get_user_task(user_id, pagination=PaginationParams(), shape=ResponseShape.NORMALIZED)
+    page = json.loads(response.body)
+
+    assert repository.get_versioned_user_task.call_args[0][2] == ResponseShape.NORMALIZED
+    assert all("user" not in item for item in page["items"])
+    assert page["users"] == {str(user_id): {"first_name": "Test", "last_name": None, "username": "testuser"}}
+
+
+@pytest.mark.asyncio
+async def test_normalized_page_fetches_distinct_users_in_one_query():
+    owner_a, owner_b = uuid.uuid4(), uuid.uuid4()
+    rows = [(uuid.uuid4(), "Task", None, TaskStatus.NEW, owner, 1) for owner in (owner_a, owner_b, owner_a)]
+    page_result, users_result = MagicMock(), MagicMock()
+    page_result.all.return_value = rows
+    users_result.__iter__.return_value = iter([(owner_a, "A", None, "a"), (owner_b, "B", None, "b")])
+    session_factory, session = session_factory_returning(page_result, users_result)
+    repository = TaskRepository(session_factory=session_factory)
+
+    page = await repository.get_all(PaginationParams(count=CountMode.NONE), ResponseShape.NORMALIZED)
+
+    assert len(page.items) == 3
+    assert set(page.users) == {owner_a, owner_b}
+    users_sql = str(session.execute.call_args_list[1][0][0])
+    assert "JOIN" not in str(session.execute.call_args_list[0][0][0])
+    assert "WHERE \"user\".id IN" in users_sql
+
+
+@pytest.mark.asyncio
+async def test_unchanged_list_is_not_modified_without_page_query():
+    user_id = uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get_change_version.return_value = 7
+    repository.get_versioned_user_task.return_value = (7, TaskPage([make_record(user_id=user_id)], 1, None))
+    service = TaskService(repository)
+
+    first = await service.get_user_task(user_id, pagination=PaginationParams())
+    etag = first.headers["etag"]
+    repository.get_versioned_user_task.reset_mock()
+
+    response = await service.get_user_task(user_id, pagination=PaginationParams(), if_none_match=frozenset([etag]))
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    repository.get_versioned_user_task.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_list_etag_comes_from_the_version_read_with_the_page():
+    user_id = uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    # A separate version read that is ahead of the page must not end up in the ETag sent with that page
+    repository.get_change_version.return_value = 8
+    repository.get_versioned_user_task.return_value = (7, TaskPage([], 0, None))
+    service = TaskService(repository)
+
+    response = await service.get_user_task(user_id, pagination=PaginationParams(), if_none_match=frozenset(['"x"']))
+
+    assert response.headers["etag"] == service._list_etag(user_id, 7, PaginationParams(), ResponseShape.EMBEDDED, {})
+
+
+@pytest.mark.asyncio
+async def test_list_etag_changes_with_version_and_query():
+    user_id = uuid.uuid4()
+    repository = AsyncMock(spec=TaskRepository)
+    service = TaskService(repository)
+
+    async def etag(version, **filters):
+        repository.get_versioned_user_task.return_value = (version, TaskPage([], 0, None))
+        response = await service.get_user_task(user_id, pagination=PaginationParams(), **filters)
+        return response.headers["etag"]
+
+    assert await etag(1) != await etag(2)
+    assert await etag(1) != await etag(1, status=TaskStatus.NEW)
+    assert await etag(1) != await etag(1, shape=ResponseShape.NORMALIZED)
+
+
+@pytest.mark.asyncio
+async def test_single_task_etag_is_its_version():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.get.return_value = make_record()
+    service = TaskService(repository)
+
+    response = await service.get(uuid.uuid4(), frozenset(['"2"']))
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"2"'
+
+
+def stream_of(*batches):
+    async def stream(*args, **kwargs):
+        for batch in batches:
+            yield batch
+
+    return MagicMock(side_effect=stream)
+
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.asyncio
+async def test_export_streams_ndjson_batches():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.stream_user_tasks = stream_of([make_record(), make_record()], [make_record()])
+    service = TaskService(repository, export_batch_size=2)
+    user_id = uuid.uuid4()
+
+    response = await service.export_user_tasks(user_id, TaskFileFormat.NDJSON, status=None)
+
+    assert response.media_type == "application/x-ndjson"
+    lines = (await read_body(response)).splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[0])["status"] == TaskStatus.IN_PROGRESS.value
+    repository.stream_user_tasks.assert_called_once_with(user_id, 2, status=None)
+
+
+@pytest.mark.asyncio
+async def test_export_streams_csv_with_single_header():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.stream_user_tasks = stream_of([make_record()], [make_record()])
+    service = TaskService(repository)
+
+    response = await service.export_user_tasks(uuid.uuid4(), TaskFileFormat.CSV)
+
+    lines = (await read_body(response)).decode().splitlines()
+    assert lines[0] == "id,title,description,status,user_id,version"
+    assert len(lines) == 3
+    assert lines[1].split(",")[3] == TaskStatus.IN_PROGRESS.value
+
+
+@pytest.mark.asyncio
+async def test_export_failing_before_first_batch_is_a_server_error():
+    async def failing(*args, **kwargs):
+        raise ConnectionError("down")
+        yield
+
+    repository = AsyncMock(spec=TaskRepository)
+    repository.stream_user_tasks = MagicMock(side_effect=failing)
+    service = TaskService(repository)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.export_user_tasks(uuid.uuid4(), TaskFileFormat.NDJSON)
+
+    assert exc.value.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_stream_reads_through_a_server_side_cursor():
+    row = tuple(make_record().values())[:6]
+
+    async def partitions():
+        yield [row, row]
+        yield [row]
+
+    streamed = MagicMock()
+    streamed.partitions.side_effect = partitions
+    session_factory, session = session_factory_returning()
+    session.stream = AsyncMock(return_value=streamed)
+    repository = TaskRepository(session_factory=MagicMock(), read_session_factory=session_factory)
+
+    batches = [batch async for batch in repository.stream_user_tasks(uuid.uuid4(), batch_size=2)]
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    stmt = session.stream.call_args[0][0]
+    assert stmt.get_execution_options()["yield_per"] == 2
+
+
+async def body_of(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson_validates_rows_and_reports_per_chunk():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.copy_user_tasks.side_effect = lambda user_id, tasks: len(tasks)
+    service = TaskService(repository, import_chunk_size=2)
+    user_id = uuid.uuid4()
+
+    report = await service.import_user_tasks(user_id, TaskFileFormat.NDJSON, body_of(
+        b'{"title": "a"}\n{"tit', b'le": "b", "status": "Completed"}\n\n{"description": "no title"}\n',
+        b'{"title": "c"}'))
+
+    assert (report.imported, report.rejected) == (3, 1)
+    assert [(chunk.rows, chunk.imported) for chunk in report.chunks] == [(2, 2), (2, 1)]
+    assert report.chunks[1].errors[0].row == 3
+    assert "title" in report.chunks[1].errors[0].error
+    first_chunk = repository.copy_user_tasks.call_args_list[0].args[1]
+    assert first_chunk[1].status == TaskStatus.COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_import_csv_handles_quoted_newlines_and_defaults():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.copy_user_tasks.side_effect = lambda user_id, tasks: len(tasks)
+    service = TaskService(repository)
+
+    report = await service.import_user_tasks(uuid.uuid4(), TaskFileFormat.CSV, body_of(
+        b'title,description,status\r\nFirst,"multi\r\nline, with comma",In progress\r\n',
+        b'Second,,\r\n,missing title,New\r\n'))
+
+    assert (report.imported, report.rejected) == (2, 1)
+    tasks = repository.copy_user_tasks.call_args.args[1]
+    assert tasks[0].description == "multi\r\nline, with comma"
+    assert tasks[0].status == TaskStatus.IN_PROGRESS
+    assert (tasks[1].description, tasks[1].status) == (None, TaskStatus.NEW)
+
+
+@pytest.mark.asyncio
+async def test_failed_import_chunk_does_not_stop_later_chunks():
+    repository = AsyncMock(spec=TaskRepository)
+    repository.copy_user_tasks.side_effect = [ConnectionError("down"), 1]
+    service = TaskService(repository, import_chunk_size=1)
+
+    report = await service.import_user_tasks(uuid.uuid4(), TaskFileFormat.NDJSON,
+                                             body_of(b'{"title": "a"}\n{"title": "b"}\n'))
+
+    assert report.chunks[0].error is not None
+    assert (report.imported, report.rejected) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_copy_loads_rows_through_asyncpg_copy():
+    driver_connection = MagicMock()
+    driver_connection.copy_records_to_table = AsyncMock()
+    connection = MagicMock()
+    connection.get_raw_connection = AsyncMock(return_value=MagicMock(driver_connection=driver_connection))
+    session_factory, session = session_factory_returning(MagicMock())
+    session.connection = AsyncMock(return_value=connection)
+    repository = TaskRepository(session_factory=session_factory)
+    user_id = uuid.uuid4()
+
+    assert await repository.copy_user_tasks(user_id, [TaskCreate(title="a", status=TaskStatus.COMPLETED)]) == 1
+
+    args, kwargs = driver_connection.copy_records_to_table.call_args
+    assert args == ("task",)
+    _, title, description, status, owner, version = kwargs["records"][0]
+    assert (title, description, status, owner, version) == ("a", None, "COMPLETED", user_id, 1)
+    assert "task_change_version" in str(session.execute.call_args[0][0])
+
+
+@pytest.mark.asyncio
+async def test_primary_change_version_skips_the_read_session():
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = 5
+    session_factory, session = session_factory_returning(result)
+    read_session_factory = MagicMock()
+    repository = TaskRepository(session_factory=session_factory, read_session_factory=read_session_factory)
+
+    assert await repository.get_change_version(uuid.uuid4(), primary=True) == 5
+    read_session_factory.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_batch_update_and_delete_run_one_statement_each():
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+    changed = MagicMock()
+    changed.scalars.return_value.all.return_value = [task_id]
+    session_factory, session = session_factory_returning(changed, MagicMock(), changed, MagicMock())
+    repository = TaskRepository(session_factory=session_factory)
+
+    assert await repository.update_user_tasks(user_id, [TaskBatchUpdate(id=task_id, title="New")]) == [task_id]
+    assert await repository.delete_user_tasks(user_id, [task_id]) == [task_id]
+
+    update_sql, _, delete_sql, _ = (str(call.args[0]) for call in session.execute.call_args_list)
+    assert update_sql.startswith("UPDATE task SET")
+    assert delete_sql.startswith("DELETE FROM task")
@@ -0,0 +1,91 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.write_combiner import WriteCombiner
+from app.repository.task_repository import TaskRepository
+from app.schemas.task import TaskInDB
+from app.services.task_service import TaskService
+
+
+def recording_flush(fail_on=None):
+    batches = []
+
+    async def flush(items):
+        batches.append(list(items))
+        if fail_on in items:
+            raise ValueError(f"bad item {fail_on}")
+        return [item * 10 for item in items]
+
+    return flush, batches
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_share_one_flush():
+    flush, batches = recording_flush()
+    combiner = WriteCombiner(flush, max_batch=100, max_delay=0.01)
+
+    results = await asyncio.gather(*(combiner.submit(item) for item in (1, 2, 3)))
+
+    assert results == [10, 20, 30]
+    assert batches == [[1, 2, 3]]
+    assert combiner.stats() == {"batches": 1, "items": 3, "fallbacks": 0, "pending": 0}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_the_window():
+    flush, batches = recording_flush()
+    combiner = WriteCombiner(flush, max_batch=2, max_delay=60)
+
+    results = await asyncio.wait_for(asyncio.gather(*(combiner.submit(item) for item in (1, 2))), timeout=1)
+
+    assert results == [10, 20]
+    assert batches == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_item_by_item():
+    flush, batches = recording_flush(fail_on=2)
+    combiner = WriteCombiner(flush, max_batch=100, max_delay=0.01)
+
+    results = await asyncio.gather(*(combiner.submit(item) for item in (1, 2, 3)), return_exceptions=True)
+
+    assert results[0] == 10 and results[2] == 30
+    assert isinstance(results[1], ValueError)
+    assert batches == [[1, 2, 3], [1], [2], [3]]
+    assert combiner.stats()["fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_items():
+    flush, batches = recording_flush()
+    combiner = WriteCombiner(flush, max_batch=100, max_delay=60)
+
+    pending = asyncio.create_task(combiner.submit(1))
+    await asyncio.sleep(0)
+    await combiner.close()
+
+    assert await pending == 10
+    assert batches == [[1]]
+
+
+@pytest.mark.asyncio
+async def test_task_create_goes_through_the_combiner():
+    repository = AsyncMock(spec=TaskRepository)
+    combiner = AsyncMock(spec=WriteCombiner)
+    service = TaskService(repository, create_combiner=combiner)
+    task = TaskInDB(title="Write report", user_id=uuid.uuid4())
+
+    response = await service.create(task)
+
+    assert response.status_code == 201
+    combiner.submit.assert_awaited_once_with(task)
+    repository.create.assert_not_called()
+
+    combiner.submit.side_effect = ValueError("foreign key violation")
+    with pytest.raises(HTTPException) as error:
+        await service.create(task)
+    assert error.value.status_code == 500